@@ -1,80 +1,327 @@
-import requests
-from bs4 import BeautifulSoup
-from pypresence import Presence
 import re
+import itertools
 import json
 import sys
 import os
+import logging
+import threading
+import time
+from http_client import get_client
+import metrics
+from rpc_worker import PresenceWorker
+from game_index import GameIndex, INDEX_FILE, newest_index
+from parse_xml import cover_urls
+from lookup_cache import LookupCache, CACHE_FILE
+from search_index import SearchIndex, DEFAULT_LIMIT, FUZZY_BUDGET_MS
+
+logger = logging.getLogger(__name__)
 
 # Discord Client ID for Nintendo Switch 2
 CLIENT_ID = '1456107266766798971'
 
+def _pypresence(client_id):
+    # Imported on the RPC thread so pypresence/asyncio don't slow down startup
+    from pypresence import Presence
+    return Presence(client_id)
+
 class SwitchRPCBackend:
-    def __init__(self):
-        self.rpc = None
-        self.connected = False
+    def __init__(self, http_client=None, presence_factory=_pypresence, lazy=False, on_connection_change=None):
+        """
+        With lazy=True the game DB isn't loaded here; call load_db() (e.g. from a
+        worker thread) and wait on db_ready. The Discord connection is always
+        made in the background; on_connection_change(connected) reports it.
+        """
+        self._http = http_client
+        # Discord RPC lives on its own thread; connecting never blocks the caller
+        self.presence = PresenceWorker(CLIENT_ID, presence_factory, on_connection_change=on_connection_change)
+        self.db_ready = threading.Event()
         self.game_db = []
-        self._load_game_db()
-        try:
-            self.rpc = Presence(CLIENT_ID)
-            self.rpc.connect()
-            self.connected = True
-            print("Connected to Discord RPC")
-        except Exception as e:
-            print(f"Failed to connect to Discord RPC: {e}")
+        self._id_index = {}
+        self._title_index = {}
+        self.search_index = SearchIndex([])
+        self.lookup_cache = LookupCache(os.path.join(self._base_path(), CACHE_FILE))
+        self._revalidating = set()
+        metrics.register_source('lookup_cache', self.lookup_cache.stats)
+        metrics.register_source('rpc', self.presence.stats)
+        metrics.register_source('http', lambda: self._http.stats() if self._http else {})
+        if not lazy:
+            self.load_db()
 
-    def reload_db(self):
+    @property
+    def http(self):
+        # Shared pooled HTTP client (timeouts, retries, per-host concurrency cap),
+        # created on first use so requests isn't imported at startup
+        if self._http is None:
+            self._http = get_client()
+        return self._http
+
+    @property
+    def connected(self):
+        return self.presence.connected
+
+    def load_db(self):
+        """Loads the game DB and builds the lookup indexes. Safe to run on a worker thread."""
         self._load_game_db()
+        self._build_lookup_indexes()
+        self.db_ready.set()
         return self.game_db
 
-    def _load_game_db(self):
+    def reload_db(self):
+        return self.load_db()
+
+    def apply_db_delta(self, delta):
+        """
+        Applies a delta from parse_xml.update_db to the in-memory game list
+        instead of reloading games.json. Returns the old records that were
+        removed or replaced, so callers can update anything derived from them.
+        A full rebuild (delta['full']) just reloads the DB and returns [], since
+        there is no previous build to diff against; rebuild anything derived instead.
+        """
+        if delta.get('full'):
+            self.reload_db()
+            return []
+
+        if isinstance(self.game_db, GameIndex):
+            # update_db already rewrote the index; reopening it is constant time
+            old_index = self.game_db
+            dropped = [old_index.get(game_id) for game_id in delta['removed']]
+            dropped += [old_index.get(game['id']) for game in delta['changed']]
+            dropped = [game for game in dropped if game]
+            self._load_game_db()
+            self._update_lookup_indexes(dropped, delta['changed'] + delta['added'])
+            return dropped
+
+        changed = {game['id']: game for game in delta['changed']}
+        removed = set(delta['removed'])
+        dropped = []
+        kept = []
+        for game in self.game_db:
+            if game['id'] in removed:
+                dropped.append(game)
+            elif game['id'] in changed:
+                dropped.append(game)
+                kept.append(changed.pop(game['id']))
+            else:
+                kept.append(game)
+
+        # Anything "changed" we didn't hold yet is new to us
+        kept.extend(changed.values())
+        kept.extend(delta['added'])
+        self.game_db = kept
+        self._update_lookup_indexes(dropped, delta['changed'] + delta['added'])
+        logger.info(f"Applied DB delta: {len(self.game_db)} games.")
+        return dropped
+
+    @staticmethod
+    def _base_path():
         # Determine path safely for EXE
         if getattr(sys, 'frozen', False):
-            base_path = os.path.dirname(sys.executable)
-        else:
-            base_path = os.path.abspath(".")
-        
+            return os.path.dirname(sys.executable)
+        return os.path.abspath(".")
+
+    @metrics.timed('db.load')
+    def _load_game_db(self):
+        base_path = self._base_path()
         json_path = os.path.join(base_path, 'games.json')
+        index_path = os.path.join(base_path, INDEX_FILE)
+        started = time.perf_counter()
+
+        # Other threads may still be reading the previous DB, so the new one replaces it in
+        # a single assignment and the old index is never closed here; it is unmapped once
+        # the last reader lets go of it. Until then Windows can't replace games.idx, and
+        # GameIndex reads the parked games.idx.new instead.
+
+        # Prefer the memory-mapped index; it opens in constant time
+        if self._index_is_current(index_path, json_path):
+            try:
+                game_db = GameIndex(index_path)
+                self.game_db = game_db
+                logger.info(f"Loaded {len(game_db)} games from local index in {(time.perf_counter() - started) * 1000:.1f} ms.")
+                return
+            except Exception as e:
+                logger.warning(f"Could not open {INDEX_FILE}, falling back to games.json: {e}")
 
         try:
             with open(json_path, 'r', encoding='utf-8') as f:
-                self.game_db = json.load(f)
-            print(f"Loaded {len(self.game_db)} games from local DB.")
+                game_db = json.load(f)
+            self.game_db = game_db
+            logger.info(f"Loaded {len(game_db)} games from local DB in {(time.perf_counter() - started) * 1000:.0f} ms.")
         except Exception as e:
-            print(f"Could not load games.json: {e}")
+            logger.warning(f"Could not load games.json: {e}")
+
+    @metrics.timed('db.build_indexes')
+    def _build_lookup_indexes(self):
+        """
+        Builds the normalized lookup tables once per DB load:
+        upper-cased ID -> record, and lower-cased title -> IDs (titles repeat across regions).
+        Localized titles (aliases) go into the same title multimap after every main
+        title, so an exact main-title match always comes first.
+        The memory-mapped index already has sorted ID and title tables, so neither
+        dict is built for it; only the autocomplete index is.
+        """
+        self._id_index = {}
+        self._title_index = {}
+        if not isinstance(self.game_db, GameIndex):
+            self._build_dict_indexes()
+        self.search_index = SearchIndex(self._search_titles())
+
+    def _build_dict_indexes(self):
+        # games.json fallback
+        self._id_index = {g['id'].upper(): g for g in self.game_db}
+        ids = [g['id'] for g in self.game_db]
+        for game_id, title in zip(ids, self.get_titles()):
+            self._title_index.setdefault(title.lower(), []).append(game_id)
+        for game_id, aliases in zip(ids, self.get_aliases()):
+            for alias in aliases:
+                self._title_index.setdefault(alias.lower(), []).append(game_id)
+
+    def _update_lookup_indexes(self, dropped, new_games):
+        # A reopened GameIndex already carries the new ID and title tables
+        if not isinstance(self.game_db, GameIndex):
+            self._update_dict_indexes(dropped, new_games)
+
+        for game in dropped:
+            for title in [game['title']] + game.get('aliases', []):
+                self.search_index.remove(title)
+        for game in new_games:
+            for title in [game['title']] + game.get('aliases', []):
+                self.search_index.add(title)
+
+    def _update_dict_indexes(self, dropped, new_games):
+        for game in dropped:
+            for key in {name.lower() for name in [game['title']] + game.get('aliases', [])}:
+                ids = self._title_index.get(key, [])
+                if game['id'] in ids:
+                    ids.remove(game['id'])
+                    if not ids:
+                        del self._title_index[key]
+            self._id_index.pop(game['id'].upper(), None)
+
+        for game in new_games:
+            self._title_index.setdefault(game['title'].lower(), []).append(game['id'])
+            for alias in game.get('aliases', []):
+                self._title_index.setdefault(alias.lower(), []).append(game['id'])
+            self._id_index[game['id'].upper()] = game
+
+    def lookup_by_id(self, game_id):
+        """Returns the local DB record for a game ID (case-insensitive), or None."""
+        # Read once: a reload may swap in another DB at any moment
+        game_db = self.game_db
+        if isinstance(game_db, GameIndex):
+            return game_db.get(game_id)
+        return self._id_index.get(game_id.upper())
+
+    def lookup_by_title(self, title):
+        """Returns the local DB record whose title or localized title matches exactly (case-insensitive), or None."""
+        game_db = self.game_db
+        if isinstance(game_db, GameIndex):
+            i = game_db.find_title(title)
+            return game_db[i] if i >= 0 else None
+        ids = self._title_index.get(title.lower())
+        if not ids:
+            return None
+        return self.lookup_by_id(ids[0])
+
+    @metrics.timed('search.autocomplete')
+    def autocomplete(self, query, limit=DEFAULT_LIMIT, budget_ms=FUZZY_BUDGET_MS):
+        """
+        Top `limit` titles containing query, prefix matches first. When there
+        aren't enough, typo-tolerant fuzzy matches fill the remaining slots.
+        """
+        matches = self.search_index.search(query, limit)
+        if len(matches) < limit:
+            for title in self.search_index.fuzzy(query, limit, budget_ms):
+                if title not in matches:
+                    matches.append(title)
+                    if len(matches) >= limit:
+                        break
+        return matches
+
+    @metrics.timed('search.fuzzy')
+    def fuzzy_lookup(self, query, budget_ms=FUZZY_BUDGET_MS):
+        """Returns the local DB record best matching a misspelt or abbreviated title, or None."""
+        best = self.search_index.fuzzy(query, 1, budget_ms)
+        return self.lookup_by_title(best[0]) if best else None
+
+    @staticmethod
+    def _index_is_current(index_path, json_path):
+        path = newest_index(index_path)
+        if path is None:
+            return False
+        return not os.path.exists(json_path) or os.path.getmtime(path) >= os.path.getmtime(json_path)
 
     def get_game_db(self):
         """Returns the full game database list."""
         return self.game_db
 
-    def update_presence(self, state, details, large_image, large_text, small_image, small_text):
-        if not self.connected or not self.rpc:
-            try:
-                self.rpc = Presence(CLIENT_ID)
-                self.rpc.connect()
-                self.connected = True
-            except Exception as e:
-                print(f"Reconnection failed: {e}")
-                return
+    def get_titles(self):
+        """Returns every title in DB order, lazily when the index is loaded."""
+        game_db = self.game_db
+        if isinstance(game_db, GameIndex):
+            return game_db.column('title')
+        return [g['title'] for g in game_db]
 
-        try:
-            # pypresence handling of image URLs depends on Discord's allow-list, 
-            # but usually it requires an asset key. 
-            # If the large_image is a URL, we might need to rely on Discord's 
-            # auto-detection or fallback to a generic image if it fails.
-            # For now, we pass it as is.
-            self.rpc.update(
-                state=state,
-                details=details,
-                large_image=large_image,
-                large_text=large_text,
-                small_image=small_image,
-                small_text=small_text
-            )
-            print(f"Updated presence: {details} - {state}")
-        except Exception as e:
-            print(f"Failed to update presence: {e}")
+    def get_aliases(self):
+        """Returns every game's list of localized titles in DB order (empty lists for DBs built before aliases existed)."""
+        game_db = self.game_db
+        if isinstance(game_db, GameIndex):
+            if not game_db.has_field('aliases'):
+                return itertools.repeat([], len(game_db))
+            return game_db.column('aliases')
+        return [g.get('aliases', []) for g in game_db]
+
+    def _search_titles(self):
+        # Main titles first so they win ties in the autocomplete, then every localized title
+        return itertools.chain(self.get_titles(), itertools.chain.from_iterable(self.get_aliases()))
+
+    def update_presence(self, state, details, large_image, large_text, small_image, small_text, start=None):
+        """
+        Queues a presence update on the RPC worker and returns a Future:
+        True once sent, False if a newer update replaced it first.
+        start (epoch seconds) makes Discord show the elapsed time.
+        """
+        # pypresence handling of image URLs depends on Discord's allow-list, 
+        # but usually it requires an asset key. 
+        # If the large_image is a URL, we might need to rely on Discord's 
+        # auto-detection or fallback to a generic image if it fails.
+        # For now, we pass it as is.
+        future = self.presence.update(
+            state=state,
+            details=details,
+            large_image=large_image,
+            large_text=large_text,
+            small_image=small_image,
+            small_text=small_text,
+            start=start
+        )
+        queued = time.perf_counter()
+        future.add_done_callback(lambda f: self._log_presence_result(f, f"{details} - {state}", queued))
+        return future
+
+    def clear_presence(self):
+        queued = time.perf_counter()
+        future = self.presence.clear()
+        future.add_done_callback(lambda f: self._log_presence_result(f, "cleared", queued))
+        return future
+
+    @staticmethod
+    def _log_presence_result(future, description, queued):
+        if future.exception():
+            metrics.count('rpc.errors')
+            logger.error(f"Failed to update presence: {future.exception()}")
+        elif future.result():
+            # Queue to sent, including any wait for the connection or the rate limit
+            metrics.observe('rpc.update', (time.perf_counter() - queued) * 1000)
+            logger.info(f"Updated presence: {description}")
+        else:
+            metrics.count('rpc.superseded')
+
+    def close(self):
+        """Disconnects from Discord and writes pending cache changes."""
+        self.presence.close()
+        self.lookup_cache.flush()
 
+    @metrics.timed('search.gametdb')
     def search_gametdb(self, query):
         """
         Searches GameTDB.
@@ -82,65 +329,163 @@ class SwitchRPCBackend:
         Strategy 2: Check if query looks like an ID (e.g. AAACA) and fetch directly.
         """
         
-        # Helper headers to mimic browser
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-
         # Strategy 1: Local DB Lookup (Name -> ID)
         found_id_by_name = None
         if self.game_db:
-             query_upper = query.upper()
              # If exact ID match in DB (unlikely if user typed name, but possible)
-             for game in self.game_db:
-                 if game['id'].upper() == query_upper:
-                     found_id_by_name = game['id']
-                     print(f"Direct ID match in DB: {found_id_by_name}")
-                     break
-             
-             if not found_id_by_name:
+             game = self.lookup_by_id(query)
+             if game:
+                 found_id_by_name = game['id']
+                 logger.info(f"Direct ID match in DB: {found_id_by_name}")
+             else:
                  # Check names
-                 query_lower = query.lower()
-                 for game in self.game_db:
-                     if game['title'].lower() == query_lower:
-                         found_id_by_name = game['id']
-                         print(f"Exact Name match in DB: {found_id_by_name}")
-                         break
+                 game = self.lookup_by_title(query)
+                 if game:
+                     found_id_by_name = game['id']
+                     logger.info(f"Exact Name match in DB: {found_id_by_name}")
         
         if found_id_by_name:
             query = found_id_by_name # Promote to ID for Strategy 2
 
         # Strategy 2: Check ID first if it looks like one (5 uppercase chars usually)
         if re.match(r'^[A-Z0-9]{5}$', query.upper()):
-            game_id = query.upper()
-            url = f"https://www.gametdb.com/Switch/{game_id}"
-            print(f"Attempting valid ID fetch: {url}")
-            try:
-                res = requests.get(url, headers=headers)
-                if res.status_code == 200:
-                    return self._parse_game_page(res.text, game_id)
-            except Exception as e:
-                print(f"Error fetching ID {game_id}: {e}")
+            result = self._fetch_game_page(query.upper())
+            if result:
+                return result
+
+        # Strategy 1b: Fuzzy local match (typos, abbreviations) before searching online
+        if not found_id_by_name and self.game_db:
+            game = self.fuzzy_lookup(query)
+            if game:
+                logger.info(f"Fuzzy Name match in DB: {game['id']} ({game['title']})")
+                result = self._fetch_game_page(game['id'])
+                if result:
+                    return result
 
         # Strategy 1: Search query
         search_url = "https://www.gametdb.com/Switch/Search"
         params = {'q': query}
-        print(f"Attempting search: {params}")
+        logger.info(f"Attempting search: {params}")
         
         try:
-            res = requests.get(search_url, params=params, headers=headers)
+            res = self.http.get(search_url, params=params)
             if res.status_code == 200:
                 # If we got a direct list or no results, parsing is needed.
                 # However, for now, let's assume the user might want a specific ID if general search fails.
                 # We can implement a more complex search parser here later if needed.
                 return None
         except Exception as e:
-            print(f"Search failed: {e}")
+            logger.error(f"Search failed: {e}")
             
         return None
 
+    def fetch_game(self, game_id, refresh=False):
+        """
+        Returns the parsed GameTDB page for a game ID, from the lookup cache when
+        possible. refresh=True re-downloads stale entries before returning, and
+        only returns results that were verified and cached: it raises if the
+        covers can't be checked (e.g. offline) instead of returning a guess.
+        """
+        game_id = game_id.upper()
+        if refresh:
+            cached, fresh = self.lookup_cache.get(game_id)
+            if cached and fresh:
+                return cached
+            return self._resolve_locally(game_id, verified=True) or self._download_game_page(game_id)
+        return self._fetch_game_page(game_id)
+
+    def _fetch_game_page(self, game_id):
+        # Serve repeat lookups from the persistent cache
+        cached, fresh = self.lookup_cache.get(game_id)
+        if cached and fresh:
+            logger.debug(f"Cache hit for {game_id}")
+            metrics.count('lookup.cache_hits')
+            return cached
+        if cached:
+            # Stale: answer now, refresh in the background
+            metrics.count('lookup.stale_hits')
+            logger.debug(f"Cache hit for {game_id} (stale, revalidating)")
+            if game_id not in self._revalidating:
+                self._revalidating.add(game_id)
+                threading.Thread(target=self._revalidate, args=(game_id,), daemon=True).start()
+            return cached
+
+        # Resolve from the local DB (cover URLs precomputed from switchtdb.xml), no page fetch
+        result = self._resolve_locally(game_id)
+        if result:
+            return result
+
+        return self._download_game_page(game_id)
+
+    @metrics.timed('gametdb.resolve_locally')
+    def _resolve_locally(self, game_id, verified=False):
+        """
+        Builds the lookup result from the local DB and the precomputed cover URLs.
+        Candidates are checked with HEAD requests in region priority order; returns
+        None if the game has no known cover, so the caller falls back to the page.
+        If a check fails (e.g. offline) the first candidate is returned as an
+        uncached guess, or with verified=True the error is raised.
+        """
+        game = self.lookup_by_id(game_id)
+        if not game or not game.get('cover_regions'):
+            return None
+
+        candidates = cover_urls(game['id'], game['cover_regions'])
+        result = {
+            'name': game['title'],
+            'image_url': candidates[0],
+            'page_url': f"https://www.gametdb.com/Switch/{game['id']}"
+        }
+        for url in candidates:
+            try:
+                res = self.http.request('HEAD', url)
+            except Exception as e:
+                logger.warning(f"Could not check cover {url}: {e}")
+                if verified:
+                    raise
+                # Offline: the first candidate is the best guess, but don't cache a guess
+                return result
+            if res.status_code == 200:
+                logger.info(f"Resolved {game['id']} locally, cover: {url}")
+                result['image_url'] = url
+                self.lookup_cache.put(game['id'], result)
+                return result
+        return None
+
+    def _revalidate(self, game_id):
+        # Same path as a prefetch refresh: verified covers from the local DB first, the page only if needed
+        try:
+            self.fetch_game(game_id, refresh=True)
+        except Exception as e:
+            logger.warning(f"Could not revalidate {game_id}: {e}")
+        finally:
+            self._revalidating.discard(game_id)
+
+    @metrics.timed('gametdb.download')
+    def _download_game_page(self, game_id):
+        url = f"https://www.gametdb.com/Switch/{game_id}"
+        logger.info(f"Attempting valid ID fetch: {url}")
+        try:
+            res = self.http.get(url)
+            if res.status_code == 200:
+                result = self._parse_game_page(res.text, game_id)
+                self.lookup_cache.put(game_id, result)
+                return result
+        except Exception as e:
+            logger.error(f"Error fetching ID {game_id}: {e}")
+        return None
+
+    def cache_stats(self):
+        """Hit/miss counters of the GameTDB lookup cache."""
+        return self.lookup_cache.stats()
+
+    @metrics.timed('gametdb.parse_page')
     def _parse_game_page(self, html, game_id):
-        soup = BeautifulSoup(html, 'lxml')
+        # Only needed when a page actually has to be scraped
+        from bs4 import BeautifulSoup, SoupStrainer
+
+        # Only the title and the images matter; don't build the rest of the tree
+        soup = BeautifulSoup(html, 'lxml', parse_only=SoupStrainer(['h1', 'img']))
         
         # Extract Title
         # Title is often in h1, format "ID - Title"
@@ -162,25 +507,21 @@ class SwitchRPCBackend:
         # <a href="..." class="highslide" ...><img src="https://art.gametdb.com/switch/cover/US/AAACA.jpg?..." ...></a>
         # We want the 'cover' or 'coverHQ' URL.
         
-        # Try finding the 'coverHQ' image first (High Quality) containing the ID
-        img_tags = soup.find_all('img')
-        found_hq = False
-        
-        # First pass: Look for coverHQ with Game ID
-        for img in img_tags:
+        # Prefer the 'coverHQ' image (High Quality) containing the ID,
+        # fall back to the standard cover; one pass over the images
+        cover = None
+        for img in soup.find_all('img'):
             src = img.get('src', '')
-            if 'art.gametdb.com/switch/coverHQ/' in src and game_id in src:
+            if game_id not in src:
+                continue
+            if 'art.gametdb.com/switch/coverHQ/' in src:
                 box_art = src
-                found_hq = True
                 break
-        
-        # Second pass: Fallback to standard cover with Game ID
-        if not found_hq:
-            for img in img_tags:
-                src = img.get('src', '')
-                if 'art.gametdb.com/switch/cover/' in src and game_id in src:
-                    box_art = src
-                    break
+            if cover is None and 'art.gametdb.com/switch/cover/' in src:
+                cover = src
+        else:
+            if cover:
+                box_art = cover
         
         return {
             'name': title,
@@ -189,6 +530,7 @@ class SwitchRPCBackend:
         }
 
 if __name__ == "__main__":
+    logging.basicConfig(format='%(message)s', level=logging.INFO)
     # Simple test
     backend = SwitchRPCBackend()
     result = backend.search_gametdb("AAACA")
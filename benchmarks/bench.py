@@ -0,0 +1,293 @@
+"""
+Offline benchmarks for the DB build, startup, lookups, autocomplete and page parsing.
+
+    python benchmarks/bench.py                            # 1k, 10k and 100k games
+    python benchmarks/bench.py --sizes 1000 --out a.json
+    python benchmarks/bench.py --out b.json --compare a.json
+    python benchmarks/bench.py --save-page AAACA AXN7A    # save real pages as fixtures
+
+Every run works on synthetic switchtdb.xml dumps in a temporary folder and on the
+saved GameTDB pages in benchmarks/fixtures, so nothing touches the network or the
+real games.json. Pages saved with --save-page are named gametdb_<ID>.html;
+synthetic_<ID>.html is a hand-made stand-in with the markup the parser looks for. Results are written as JSON; --compare prints the change against
+an earlier run and exits with status 1 if anything got slower than --threshold.
+Use the same machine and --repeat for both runs; more repeats give steadier numbers.
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+sys.path.insert(0, ROOT)
+
+from backend import SwitchRPCBackend
+from game_index import INDEX_FILE
+from parse_xml import parse_xml, update_db
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_THRESHOLD = 0.10
+
+WORDS = ("Super Mario Odyssey Zelda Legend Kingdom Tears Breath Wild Metroid Dread Kirby "
+         "Pokemon Splatoon Party Kart Deluxe Fire Emblem Xenoblade Chronicles Donkey Kong "
+         "Country Tropical Freeze Animal Crossing Horizons Smash Bros Ultimate Pikmin").split()
+REGIONS = ('NTSC-U', 'PAL', 'NTSC-J', 'ALL')
+
+# Typed-as-you-go prefixes, whole words and typos, as the search box sees them
+AUTOCOMPLETE_QUERIES = ('m', 'ma', 'mar', 'mari', 'mario', 'zel', 'legend of', 'kart',
+                        'metriod', 'zelda totk', 'pokmon', 'xenoblade chron')
+
+class OfflineHttp:
+    """Fails every request straight away, so a cache miss can never reach the network."""
+    def request(self, method, url, **kwargs):
+        raise ConnectionError(f"Offline benchmark: {method} {url}")
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+class NullPresence:
+    """Stands in for pypresence so the backend never talks to Discord."""
+    def __init__(self, client_id):
+        pass
+
+    def connect(self):
+        pass
+
+    def update(self, **kwargs):
+        pass
+
+    def clear(self):
+        pass
+
+    def close(self):
+        pass
+
+def write_switchtdb(path, games, seed=0):
+    """Writes a switchtdb.xml-shaped dump of `games` games; the same seed gives the same file."""
+    rng = random.Random(seed)
+    titles = []
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<datafile>\n')
+        f.write(f'<WiiTDB version="20240101" games="{games}"/>\n')
+        for i in range(games):
+            game_id = f"{i * 7919 % 0x100000:05X}"
+            title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 5)))
+            titles.append((game_id, title))
+            f.write(
+                f'<game name="{title} ({game_id})">\n'
+                f'<id>{game_id}</id>\n<type>Switch</type>\n'
+                f'<region>{rng.choice(REGIONS)}</region>\n<languages>EN,FR,DE,JA</languages>\n'
+                f'<locale lang="EN"><title>{title}</title><synopsis>Synopsis for game {i}.</synopsis></locale>\n'
+                f'<locale lang="JA"><title>{title} JP</title></locale>\n'
+                f'<developer>Nintendo</developer><publisher>Nintendo</publisher>\n'
+                f'<date year="2020" month="1" day="1"/>\n</game>\n'
+            )
+        f.write('</datafile>\n')
+    return titles
+
+def timed(fn, repeat=5, number=1):
+    """Runs fn() number times per sample; returns per-call timings in ms."""
+    samples = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - started) * 1000 / number)
+    return summarize(samples)
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        'median_ms': statistics.median(samples),
+        'min_ms': samples[0],
+        'p95_ms': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        'samples': len(samples),
+    }
+
+def peak_memory(fn):
+    """Peak Python heap use of one fn() call, in MB."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    finally:
+        tracemalloc.stop()
+
+def clean_build(directory):
+    for name in os.listdir(directory):
+        if name != 'switchtdb.xml':
+            os.remove(os.path.join(directory, name))
+
+def bench_size(games, results, repeat):
+    directory = tempfile.mkdtemp(prefix=f'switch-bench-{games}-')
+    previous_cwd = os.getcwd()
+    # The backend resolves games.json and its caches relative to the working directory
+    os.chdir(directory)
+    try:
+        titles = write_switchtdb('switchtdb.xml', games)
+        tag = f"[{games}]"
+
+        def build():
+            clean_build(directory)
+            parse_xml()
+
+        result = timed(build, repeat=max(1, repeat // 2))
+        result['peak_mb'] = peak_memory(build)
+        results['parse_xml' + tag] = result
+        results['update_db_unchanged' + tag] = timed(update_db, repeat)
+
+        backend = SwitchRPCBackend(http_client=OfflineHttp(), presence_factory=NullPresence, lazy=True)
+        try:
+            results['load_db' + tag] = timed(backend.load_db, repeat)
+            results['load_db' + tag]['peak_mb'] = peak_memory(backend.load_db)
+
+            # The games.json fallback, used when the index is missing or outdated.
+            # Windows can't rename a file that is still memory-mapped, so let go of it first.
+            backend.game_db.close()
+            os.rename(INDEX_FILE, INDEX_FILE + '.off')
+            results['load_db_json' + tag] = timed(backend.load_db, max(1, repeat // 2))
+            os.rename(INDEX_FILE + '.off', INDEX_FILE)
+            backend.load_db()
+
+            rng = random.Random(1)
+            # Titles can repeat; pair each with the ID a title lookup resolves to
+            sample = [(backend.lookup_by_title(title)['id'], title) for _, title in rng.sample(titles, min(200, len(titles)))]
+            results['lookup_by_id' + tag] = timed(lambda: [backend.lookup_by_id(game_id) for game_id, _ in sample], repeat)
+            results['lookup_by_title' + tag] = timed(lambda: [backend.lookup_by_title(title) for _, title in sample], repeat)
+
+            # search_gametdb name/ID resolution, with the pages already cached so it stays local
+            for game_id, title in sample:
+                backend.lookup_cache.put(game_id, {'name': title, 'image_url': 'switch',
+                                                   'page_url': f"https://www.gametdb.com/Switch/{game_id}"})
+            results['search_gametdb_id' + tag] = timed(lambda: [backend.search_gametdb(game_id) for game_id, _ in sample], repeat)
+            results['search_gametdb_title' + tag] = timed(lambda: [backend.search_gametdb(title) for _, title in sample], repeat)
+
+            results['fuzzy_lookup' + tag] = timed(lambda: backend.fuzzy_lookup('metriod dread'), repeat)
+            results['autocomplete' + tag] = summarize([
+                timed(lambda query=query: backend.autocomplete(query), repeat)['median_ms']
+                for query in AUTOCOMPLETE_QUERIES
+            ])
+        finally:
+            backend.close()
+    finally:
+        os.chdir(previous_cwd)
+        shutil.rmtree(directory, ignore_errors=True)
+
+def bench_pages(results, repeat):
+    backend = SwitchRPCBackend(http_client=OfflineHttp(), presence_factory=NullPresence, lazy=True)
+    try:
+        for name in sorted(os.listdir(FIXTURES)):
+            if not name.endswith('.html'):
+                continue
+            with open(os.path.join(FIXTURES, name), encoding='utf-8') as f:
+                html = f.read()
+            game_id = name[:-len('.html')].rsplit('_', 1)[-1]
+            results[f"parse_game_page[{name}]"] = timed(lambda: backend._parse_game_page(html, game_id), repeat, number=20)
+    finally:
+        backend.close()
+
+def save_pages(game_ids):
+    """Downloads GameTDB pages into benchmarks/fixtures, byte for byte, for bench_pages to parse."""
+    from http_client import HttpClient
+    client = HttpClient()
+    try:
+        for game_id in game_ids:
+            game_id = game_id.upper()
+            response = client.get(f"https://www.gametdb.com/Switch/{game_id}")
+            response.raise_for_status()
+            path = os.path.join(FIXTURES, f"gametdb_{game_id}.html")
+            with open(path, 'wb') as f:
+                f.write(response.content)
+            print(f"Saved {path} ({len(response.content)} bytes)")
+    finally:
+        client.close()
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def compare(results, baseline, threshold):
+    """Prints the change in best time per benchmark; returns the names that regressed."""
+    regressions = []
+    print(f"\n{'benchmark':<40} {'before':>10} {'after':>10} {'change':>8}")
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        # The fastest sample is the least disturbed by other load on the machine
+        old, new = before['min_ms'], result['min_ms']
+        change = (new - old) / old if old else 0.0
+        flag = ''
+        if change > threshold:
+            flag = '  SLOWER'
+            regressions.append(name)
+        elif change < -threshold:
+            flag = '  faster'
+        print(f"{name:<40} {old:>8.3f}ms {new:>8.3f}ms {change:>+7.1%}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the offline benchmarks.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="synthetic DB sizes in games (default: 1000 10000 100000)")
+    parser.add_argument('--repeat', type=int, default=5, help="samples per measurement (default: 5)")
+    parser.add_argument('--out', default='bench_results.json', help="where to write the results (default: bench_results.json)")
+    parser.add_argument('--compare', metavar='BASELINE', help="results file from an earlier run to compare against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="slowdown that counts as a regression (default: 0.10)")
+    parser.add_argument('--save-page', metavar='ID', nargs='+', help="download these GameTDB pages into benchmarks/fixtures and exit")
+    args = parser.parse_args()
+
+    if args.save_page:
+        save_pages(args.save_page)
+        return
+
+    # Keep the backend's own logging out of the report
+    logging.basicConfig(format='%(message)s', level=logging.WARNING)
+
+    results = {}
+    for games in args.sizes:
+        print(f"Benchmarking {games} games...")
+        bench_size(games, results, args.repeat)
+    print("Benchmarking page parsing...")
+    bench_pages(results, args.repeat)
+
+    for name, result in results.items():
+        peak = f"  peak {result['peak_mb']:.1f} MB" if 'peak_mb' in result else ''
+        print(f"{name:<40} {result['median_ms']:>10.3f} ms{peak}")
+
+    report = {
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {args.out}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline['results'], args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) slower than the baseline by more than {args.threshold:.0%}.")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from http_client import get_client
+
+COVER_DIR = 'covers'
+THUMB_SIZE = (160, 260)
+
+# Ready-to-display images kept in memory
+DEFAULT_MEMORY_ITEMS = 32
+
+class CoverCache:
+    """
+    Cover art cache. Downloads run on a small worker pool; each cover is stored
+    on disk as the original plus a thumbnail pre-resized to THUMB_SIZE, and the
+    most recently shown images are kept ready in memory. Showing a cover again
+    costs no network or decode time.
+
+    image_factory turns a thumbnail (PIL image) into whatever the caller displays,
+    e.g. a CTkImage. Callbacks are invoked from the worker thread as
+    on_ready(url, image, error), so GUI callers should hop back with after().
+    """
+    def __init__(self, directory=COVER_DIR, size=THUMB_SIZE, image_factory=None,
+                 memory_items=DEFAULT_MEMORY_ITEMS, workers=2, http_client=None):
+        self.directory = directory
+        self.size = size
+        self.image_factory = image_factory or (lambda thumb: thumb)
+        self.memory_items = memory_items
+        self._http = http_client
+        self.hits = 0
+        self.disk_hits = 0
+        self.downloads = 0
+        self._memory = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='cover')
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def http(self):
+        if self._http is None:
+            self._http = get_client()
+        return self._http
+
+    def _paths(self, url):
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+        ext = os.path.splitext(url.split('?', 1)[0])[1] or '.img'
+        original = os.path.join(self.directory, key + ext)
+        thumb = os.path.join(self.directory, f"{key}_{self.size[0]}x{self.size[1]}.png")
+        return original, thumb
+
+    def get_cached(self, url):
+        """Returns the ready image for url if it is in memory, else None. Never blocks."""
+        with self._lock:
+            image = self._memory.get(url)
+            if image is not None:
+                self._memory.move_to_end(url)
+                self.hits += 1
+            return image
+
+    def load(self, url, on_ready):
+        """Loads url in the background; concurrent requests for the same url share one download."""
+        image = self.get_cached(url)
+        if image is not None:
+            on_ready(url, image, None)
+            return
+
+        with self._lock:
+            if url in self._pending:
+                self._pending[url].append(on_ready)
+                return
+            self._pending[url] = [on_ready]
+        self._pool.submit(self._load, url)
+
+    def warm(self, url):
+        """Makes sure url's original and thumbnail are on disk, without keeping it in memory. Blocks."""
+        _, thumb_path = self._paths(url)
+        if not os.path.exists(thumb_path):
+            self._thumbnail(url)
+
+    def _load(self, url):
+        image, error = None, None
+        try:
+            image = self.image_factory(self._thumbnail(url))
+            with self._lock:
+                self._memory[url] = image
+                self._memory.move_to_end(url)
+                while len(self._memory) > self.memory_items:
+                    self._memory.popitem(last=False)
+        except Exception as e:
+            error = e
+
+        with self._lock:
+            callbacks = self._pending.pop(url, [])
+        for on_ready in callbacks:
+            on_ready(url, image, error)
+
+    def _thumbnail(self, url):
+        # Pillow is only needed once a cover is actually shown
+        from PIL import Image
+
+        original_path, thumb_path = self._paths(url)
+
+        if os.path.exists(thumb_path):
+            self.disk_hits += 1
+            with Image.open(thumb_path) as thumb:
+                thumb.load()
+                return thumb
+
+        if os.path.exists(original_path):
+            self.disk_hits += 1
+            with open(original_path, 'rb') as f:
+                data = f.read()
+        else:
+            if not url.startswith(('http://', 'https://')):
+                raise ValueError(f"Not an image URL: {url}")
+            response = self.http.get(url)
+            response.raise_for_status()
+            data = response.content
+            self.downloads += 1
+            self._write(original_path, data)
+
+        with Image.open(BytesIO(data)) as img:
+            thumb = img.convert('RGBA').resize(self.size, Image.LANCZOS)
+        tmp_path = thumb_path + '.tmp'
+        thumb.save(tmp_path, format='PNG')
+        os.replace(tmp_path, thumb_path)
+        return thumb
+
+    @staticmethod
+    def _write(path, data):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def stats(self):
+        return {
+            'memory_items': len(self._memory),
+            'memory_hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'downloads': self.downloads,
+        }
@@ -0,0 +1,263 @@
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+import metrics
+from backend import SwitchRPCBackend
+from log_sink import LOG_FORMAT, DATE_FORMAT
+from parse_xml import update_db
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# How long a request waits for the DB to finish loading, or for Discord to accept a presence
+DB_WAIT = 30.0
+PRESENCE_WAIT = 5.0
+
+class BadRequest(Exception):
+    """Invalid input from the client; answered with 400. Anything else that fails is a 500."""
+
+class ControlServer(ThreadingHTTPServer):
+    """
+    Local JSON control API around one long-lived SwitchRPCBackend, so scripts
+    reuse its loaded game index and Discord connection instead of paying for
+    them on every call.
+
+        GET  /status                      connection, DB and cache state
+        GET  /metrics                     counters and latency histograms (Prometheus text)
+        GET  /search?q=zelda&limit=10     autocomplete over local titles
+        GET  /lookup?q=AAACA              full lookup (local DB, cache, then GameTDB)
+        POST /presence {"details": ...}   set the presence (same fields as update_presence;
+                                          start is epoch seconds, wait how long to wait for Discord)
+        POST /clear                       clear the presence
+        POST /reload {"rebuild": false}   reload the DB; rebuild re-parses switchtdb.xml first
+                                          (409 while another reload is running)
+
+    POST bodies must be JSON with a JSON Content-Type; browsers can't send that
+    cross-origin without a preflight, which keeps web pages from driving the API.
+    """
+    daemon_threads = True
+
+    def __init__(self, backend, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        super().__init__((host, port), ControlHandler)
+        self.backend = backend
+        # One reload or rebuild at a time; they share games.json, games.idx and their temp files
+        self.reload_lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Serves on a background thread (e.g. for tests); stop with shutdown()."""
+        thread = threading.Thread(target=self.serve_forever, name='control-api', daemon=True)
+        thread.start()
+        return thread
+
+class ControlHandler(BaseHTTPRequestHandler):
+    server_version = 'SwitchRPC'
+
+    def do_GET(self):
+        if urlsplit(self.path).path == '/metrics':
+            data = metrics.registry.to_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        self._dispatch({'/status': self._status, '/search': self._search, '/lookup': self._lookup})
+
+    def do_POST(self):
+        self._dispatch({'/presence': self._presence, '/clear': self._clear, '/reload': self._reload})
+
+    def _dispatch(self, routes):
+        started = time.perf_counter()
+        parts = urlsplit(self.path)
+        route = routes.get(parts.path.rstrip('/') or '/')
+        try:
+            if route is None:
+                status, body = 404, {'error': f"Unknown endpoint {self.command} {parts.path}"}
+            else:
+                params = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+                if self.command == 'POST':
+                    params.update(self._read_json())
+                status, body = route(params)
+        except BadRequest as e:
+            status, body = 400, {'error': str(e)}
+        except Exception as e:
+            logger.error(f"{self.command} {parts.path} failed: {e}")
+            status, body = 500, {'error': str(e)}
+        self._send_json(status, body)
+        if route is not None:
+            metrics.observe(f"api.{route.__name__.strip('_')}", (time.perf_counter() - started) * 1000)
+        logger.info(f"{self.command} {parts.path} -> {status} in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        if self.headers.get_content_type() != 'application/json':
+            raise BadRequest("POST bodies must be sent as application/json")
+        try:
+            data = json.loads(self.rfile.read(length))
+        except ValueError as e:
+            raise BadRequest(f"Invalid JSON: {e}") from None
+        if not isinstance(data, dict):
+            raise BadRequest("Expected a JSON object")
+        return data
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # Requests are logged by _dispatch; keep http.server off stderr
+        pass
+
+    @property
+    def backend(self):
+        return self.server.backend
+
+    def _wait_for_db(self):
+        if not self.backend.db_ready.wait(DB_WAIT):
+            raise RuntimeError("The game database is still loading")
+
+    def _status(self, params):
+        backend = self.backend
+        return 200, {
+            'connected': backend.connected,
+            'db_ready': backend.db_ready.is_set(),
+            'games': len(backend.get_game_db()),
+            'rpc': backend.presence.stats(),
+            'lookup_cache': backend.cache_stats(),
+        }
+
+    def _search(self, params):
+        query = params.get('q', '').strip()
+        if not query:
+            raise BadRequest("Missing query parameter 'q'")
+        self._wait_for_db()
+        limit = int(self._number(params, 'limit', 10))
+        matches = []
+        for title in self.backend.autocomplete(query, limit):
+            game = self.backend.lookup_by_title(title)
+            matches.append({'id': game['id'] if game else None, 'title': title})
+        return 200, {'matches': matches}
+
+    def _lookup(self, params):
+        query = params.get('q', '').strip()
+        if not query:
+            raise BadRequest("Missing query parameter 'q'")
+        self._wait_for_db()
+        result = self.backend.search_gametdb(query)
+        if result is None:
+            return 404, {'error': f"No game found for '{query}'"}
+        return 200, result
+
+    @staticmethod
+    def _number(params, name, default=None):
+        # Query strings give text, JSON bodies numbers; both must parse before anything is queued
+        value = params.get(name)
+        if value is None or value == '':
+            return default
+        if isinstance(value, bool):
+            raise BadRequest(f"'{name}' must be a number")
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            raise BadRequest(f"'{name}' must be a number") from None
+        if not number >= 0 or number == float('inf'):
+            raise BadRequest(f"'{name}' must be a non-negative number")
+        return number
+
+    def _presence(self, params):
+        details = params.get('details')
+        if not details:
+            raise BadRequest("'details' (the game name) is required")
+        wait = self._number(params, 'wait', PRESENCE_WAIT)
+        start = self._number(params, 'start')
+        future = self.backend.update_presence(
+            state=params.get('state') or "Playing",
+            details=details,
+            large_image=params.get('large_image') or "switch",
+            large_text=params.get('large_text') or details,
+            small_image=params.get('small_image') or "online",
+            small_text=params.get('small_text') or "Online",
+            start=int(start) if start is not None else None,
+        )
+        return self._presence_result(future, wait)
+
+    def _clear(self, params):
+        wait = self._number(params, 'wait', PRESENCE_WAIT)
+        return self._presence_result(self.backend.clear_presence(), wait)
+
+    @staticmethod
+    def _presence_result(future, wait):
+        # 'sent' is False when a newer request replaced this one before it went out
+        try:
+            if not future.result(wait):
+                return 200, {'sent': False, 'superseded': True}
+        except FutureTimeout:
+            return 202, {'sent': False, 'queued': True}
+        return 200, {'sent': True}
+
+    def _reload(self, params):
+        self._wait_for_db()
+        if not self.server.reload_lock.acquire(blocking=False):
+            return 409, {'error': "A reload is already running"}
+        try:
+            return self._run_reload(params)
+        finally:
+            self.server.reload_lock.release()
+
+    def _run_reload(self, params):
+        backend = self.backend
+        started = time.perf_counter()
+        if params.get('rebuild'):
+            base_path = backend._base_path()
+            delta = update_db(input_file=os.path.join(base_path, 'switchtdb.xml'), output_file=os.path.join(base_path, 'games.json'))
+            if delta is None:
+                raise RuntimeError("XML conversion failed")
+            backend.apply_db_delta(delta)
+        else:
+            backend.reload_db()
+        return 200, {'games': len(backend.get_game_db()), 'elapsed_ms': (time.perf_counter() - started) * 1000}
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the Discord status backend headless, controlled over a local HTTP API.")
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f"address to listen on (default: {DEFAULT_HOST})")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument('--verbose', action='store_true', help="also log cache hits and other debug output")
+    args = parser.parse_args()
+    logging.basicConfig(format=LOG_FORMAT, datefmt=DATE_FORMAT, level=logging.DEBUG if args.verbose else logging.INFO)
+
+    # The API is up straight away; the DB loads and Discord connects in the background
+    backend = SwitchRPCBackend(lazy=True)
+    threading.Thread(target=backend.load_db, name='load-db', daemon=True).start()
+
+    server = ControlServer(backend, args.host, args.port)
+    logger.info(f"Control API listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Shutting down...")
+    finally:
+        server.server_close()
+        backend.close()
+
+if __name__ == "__main__":
+    main()
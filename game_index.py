@@ -0,0 +1,304 @@
+import mmap
+import os
+import struct
+import tempfile
+from collections.abc import Sequence
+
+# Compact on-disk game index, written by parse_xml next to games.json.
+#
+# Layout (little-endian):
+#   header   magic, version, record count, field count, title key count
+#   fields   per field: type ('s' string / 'l' list of strings), name length, name
+#   table    one row per record, sorted by upper-cased ID: (offset, length) into the pool per field
+#   titles   one entry per lower-cased title or alias: (offset, length) of the key in the pool
+#            and its row, sorted by key bytes with main titles before aliases
+#   pool     UTF-8 string data; identical values are stored once and shared
+#
+# The file is memory-mapped and records are decoded on demand, so opening it
+# and looking up an ID or title cost the same whatever the size of the catalogue.
+
+INDEX_FILE = 'games.idx'
+
+MAGIC = b'SW2GIDX\x00'
+VERSION = 2
+
+_HEADER = struct.Struct('<8sIIII')
+_FIELD = struct.Struct('<cB')
+_SLOT = struct.Struct('<II')
+_TITLE = struct.Struct('<III')
+
+# Separator for list fields; never appears in GameTDB titles
+LIST_SEP = '\x1f'
+
+# Longer values (rare, and unlikely to repeat) aren't deduplicated, which caps the writer's memory
+INTERN_MAX_BYTES = 512
+
+class IndexWriter:
+    """
+    Builds a games.idx file from records added one at a time.
+    String data is spooled to a temp file, so only the sort keys (IDs and
+    lower-cased titles), pool offsets and the distinct short values are held
+    in memory while the index is built. Values repeat a lot (titles across regions, locale lists), so
+    each distinct value is written to the pool once and shared by every row.
+    """
+    def __init__(self, path, fields=(('id', 's'), ('title', 's'))):
+        self.path = path
+        self.fields = list(fields)
+        self._rows = []
+        self._titles = []
+        self._pool = tempfile.TemporaryFile()
+        self._pool_size = 0
+        self._interned = {}
+
+    def _add_string(self, value):
+        return self._add_bytes(value.encode('utf-8'))
+
+    def _add_bytes(self, data):
+        slot = self._interned.get(data)
+        if slot is None:
+            slot = (self._pool_size, len(data))
+            self._pool.write(data)
+            self._pool_size += len(data)
+            if len(data) <= INTERN_MAX_BYTES:
+                self._interned[data] = slot
+        return slot
+
+    def add(self, record):
+        slots = []
+        for name, kind in self.fields:
+            value = record.get(name) or ('' if kind == 's' else [])
+            if kind == 'l':
+                value = LIST_SEP.join(value)
+            slots.extend(self._add_string(value))
+        game_id = record['id'].upper()
+        self._rows.append((game_id, slots))
+
+        # Title lookup keys: the main title ranks ahead of localized titles with the same key
+        seen = set()
+        for rank, title in enumerate([record.get('title') or ''] + list(record.get('aliases') or [])):
+            key = title.lower().encode('utf-8')
+            if key and key not in seen:
+                seen.add(key)
+                self._titles.append((key, min(rank, 1), game_id, self._add_bytes(key)))
+
+    def close(self):
+        """Writes the finished index to a temp file next to path and returns its name."""
+        self._rows.sort(key=lambda row: row[0])
+        row_struct = struct.Struct('<' + 'II' * len(self.fields))
+        row_of = {game_id: row for row, (game_id, _) in enumerate(self._rows)}
+        titles = sorted((key, rank, row_of[game_id], slot) for key, rank, game_id, slot in self._titles)
+
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as out:
+            out.write(_HEADER.pack(MAGIC, VERSION, len(self._rows), len(self.fields), len(titles)))
+            for name, kind in self.fields:
+                name_bytes = name.encode('utf-8')
+                out.write(_FIELD.pack(kind.encode('ascii'), len(name_bytes)))
+                out.write(name_bytes)
+            for _, slots in self._rows:
+                out.write(row_struct.pack(*slots))
+            for _, _, row, (offset, length) in titles:
+                out.write(_TITLE.pack(offset, length, row))
+
+            self._pool.seek(0)
+            for chunk in iter(lambda: self._pool.read(1024 * 1024), b''):
+                out.write(chunk)
+
+        self._pool.close()
+        self._rows = []
+        self._titles = []
+        self._interned = {}
+        return tmp_path
+
+    def discard(self):
+        self._pool.close()
+        self._rows = []
+        self._titles = []
+        self._interned = {}
+
+def install_index(tmp_path, path=INDEX_FILE):
+    """
+    Moves a freshly written index into place. Windows refuses to replace a file
+    that is still memory-mapped, in which case it is parked as <path>.new and
+    picked up by the next GameIndex that opens path.
+    """
+    try:
+        os.replace(tmp_path, path)
+    except PermissionError:
+        os.replace(tmp_path, path + '.new')
+        return
+    # An index parked earlier is now older than path; don't let it shadow it
+    _remove_quietly(path + '.new')
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except PermissionError:
+        # Still mapped somewhere; newest_index() ignores it since path is newer
+        pass
+
+def newest_index(path=INDEX_FILE):
+    """Returns whichever of path and a parked <path>.new was written last, or None if neither exists."""
+    candidates = [p for p in (path, path + '.new') if os.path.exists(p)]
+    if not candidates:
+        return None
+    return max(candidates, key=os.path.getmtime)
+
+class GameIndex(Sequence):
+    """
+    Read-only, memory-mapped view of games.idx.
+    Behaves like the list of {'id', 'title'} dicts loaded from games.json,
+    but only decodes the records that are actually accessed.
+    """
+    def __init__(self, path=INDEX_FILE):
+        pending = path + '.new'
+        if newest_index(path) == pending:
+            try:
+                os.replace(pending, path)
+            except PermissionError:
+                # The previous index is still mapped; read the new one directly
+                path = pending
+        elif os.path.exists(pending):
+            _remove_quietly(pending)
+
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, count, field_count, title_count = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self._mm.close()
+            raise ValueError(f"{path} is not a version {VERSION} game index")
+
+        pos = _HEADER.size
+        self.fields = []
+        for _ in range(field_count):
+            kind, name_len = _FIELD.unpack_from(self._mm, pos)
+            pos += _FIELD.size
+            name = self._mm[pos:pos + name_len].decode('utf-8')
+            pos += name_len
+            self.fields.append((name, kind.decode('ascii')))
+
+        self._count = count
+        self._field_pos = {name: i for i, (name, _) in enumerate(self.fields)}
+        self._row_size = _SLOT.size * field_count
+        self._table = pos
+        self._title_table = pos + count * self._row_size
+        self._title_count = title_count
+        self._pool = self._title_table + title_count * _TITLE.size
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._count))]
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError('game index out of range')
+        return {name: self._value(i, n) for n, (name, _) in enumerate(self.fields)}
+
+    def _value(self, i, n):
+        offset, length = _SLOT.unpack_from(self._mm, self._table + i * self._row_size + n * _SLOT.size)
+        start = self._pool + offset
+        value = self._mm[start:start + length].decode('utf-8')
+        if self.fields[n][1] == 'l':
+            return value.split(LIST_SEP) if value else []
+        return value
+
+    def field(self, i, name):
+        """Returns a single field of record i without building the whole dict."""
+        return self._value(i, self._field_pos[name])
+
+    def has_field(self, name):
+        """False for fields added after this index was written (e.g. an index from an older build)."""
+        return name in self._field_pos
+
+    def find_id(self, game_id):
+        """Binary-searches the ID table. Returns the record position, or -1."""
+        key = game_id.upper()
+        id_pos = self._field_pos['id']
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._value(mid, id_pos).upper() < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._count and self._value(lo, id_pos).upper() == key:
+            return lo
+        return -1
+
+    def find_title(self, title):
+        """
+        Binary-searches the title table for an exact, case-insensitive match of a
+        title or localized title. Returns the record position, or -1.
+        """
+        key = title.lower().encode('utf-8')
+        mm = self._mm
+        lo, hi = 0, self._title_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset, length, _ = _TITLE.unpack_from(mm, self._title_table + mid * _TITLE.size)
+            if mm[self._pool + offset:self._pool + offset + length] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._title_count:
+            offset, length, row = _TITLE.unpack_from(mm, self._title_table + lo * _TITLE.size)
+            if mm[self._pool + offset:self._pool + offset + length] == key:
+                return row
+        return -1
+
+    def get(self, game_id):
+        """Returns the record for game_id, or None."""
+        i = self.find_id(game_id)
+        return self[i] if i >= 0 else None
+
+    def iter_field(self, name):
+        """Yields one field of every record in order; much cheaper than indexing one by one."""
+        n = self._field_pos[name]
+        is_list = self.fields[n][1] == 'l'
+        mm = self._mm
+        pool = self._pool
+        row = struct.Struct('<' + 'II' * len(self.fields))
+        table = memoryview(mm)[self._table:self._title_table]
+        try:
+            for slots in row.iter_unpack(table):
+                start = pool + slots[2 * n]
+                value = mm[start:start + slots[2 * n + 1]].decode('utf-8')
+                if is_list:
+                    value = value.split(LIST_SEP) if value else []
+                yield value
+        finally:
+            table.release()
+
+    def column(self, name):
+        """Lazy sequence over one field of every record (e.g. all titles)."""
+        return _ColumnView(self, name)
+
+    def close(self):
+        self._mm.close()
+
+class _ColumnView(Sequence):
+    def __init__(self, index, name):
+        self._index = index
+        self._name = name
+
+    def __len__(self):
+        return len(self._index)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('game index out of range')
+        return self._index.field(i, self._name)
+
+    def __iter__(self):
+        return self._index.iter_field(self._name)
@@ -0,0 +1,106 @@
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+# Helper headers to mimic browser
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+# (connect, read) seconds; a hung server must never block a thread forever
+DEFAULT_TIMEOUT = (5, 15)
+
+# Hosts whose concurrent requests are capped (subdomains included)
+LIMITED_HOSTS = ('gametdb.com',)
+
+class HttpClient:
+    """
+    Shared HTTP layer for every GameTDB request made by the backend and the GUI.
+    One keep-alive requests.Session with a connection pool, default timeouts,
+    bounded retries with exponential backoff on connection errors and 429/5xx,
+    a cap on concurrent requests per limited host, and per-request timings.
+    """
+    def __init__(self, timeout=DEFAULT_TIMEOUT, retries=3, backoff=0.5, max_concurrent=4,
+                 pool_size=8, limited_hosts=LIMITED_HOSTS, history=500):
+        # Imported here so that merely importing this module stays cheap at startup
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        self.timeout = timeout
+        self.limited_hosts = tuple(limited_hosts)
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = USER_AGENT
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._limits = {host: threading.BoundedSemaphore(max_concurrent) for host in self.limited_hosts}
+        # (method, url, status or None, elapsed_ms) for recent requests
+        self.timings = deque(maxlen=history)
+        self.errors = 0
+
+    def _limit_for(self, url):
+        host = (urlsplit(url).hostname or '').lower()
+        for limited in self.limited_hosts:
+            if host == limited or host.endswith('.' + limited):
+                return self._limits[limited]
+        return None
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        limit = self._limit_for(url)
+        if limit:
+            limit.acquire()
+        started = time.perf_counter()
+        status = None
+        try:
+            response = self.session.request(method, url, **kwargs)
+            status = response.status_code
+            return response
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            if limit:
+                limit.release()
+            self.timings.append((method, url, status, (time.perf_counter() - started) * 1000))
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def stats(self):
+        """Request count, error count and latency summary (ms) of recent requests."""
+        elapsed = sorted(t[3] for t in self.timings)
+        if not elapsed:
+            return {'requests': 0, 'errors': self.errors}
+        return {
+            'requests': len(elapsed),
+            'errors': self.errors,
+            'avg_ms': sum(elapsed) / len(elapsed),
+            'p50_ms': elapsed[len(elapsed) // 2],
+            'p95_ms': elapsed[min(len(elapsed) - 1, int(len(elapsed) * 0.95))],
+            'max_ms': elapsed[-1],
+        }
+
+    def close(self):
+        self.session.close()
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Returns the process-wide HttpClient, creating it on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
@@ -0,0 +1,103 @@
+import logging
+import os
+import sys
+import threading
+from collections import deque
+from logging.handlers import RotatingFileHandler
+
+LOG_FORMAT = '%(asctime)s.%(msecs)03d %(levelname)-7s [%(threadName)s] %(name)s: %(message)s'
+DATE_FORMAT = '%H:%M:%S'
+
+# Set to a path to also keep a rotating log file, e.g. SWITCH_RPC_LOG_FILE=switch_rpc.log
+LOG_FILE_ENV = 'SWITCH_RPC_LOG_FILE'
+LOG_FILE_BYTES = 1024 * 1024
+LOG_FILE_BACKUPS = 3
+
+# Records held for the GUI between drains; beyond this the oldest are dropped
+LOG_BUFFER_LINES = 5000
+
+class QueueLogHandler(logging.Handler):
+    """
+    Collects formatted records in a bounded buffer, so any thread can log without
+    touching the GUI. The GUI drains it in batches with drain() from its own thread.
+    If records arrive faster than they are drained, the oldest are dropped and
+    counted in `dropped`, so a log flood can't grow memory without limit.
+    """
+    def __init__(self, level=logging.NOTSET, capacity=LOG_BUFFER_LINES):
+        super().__init__(level)
+        self._records = deque(maxlen=capacity)
+        self._records_lock = threading.Lock()
+        self.dropped = 0
+
+    def emit(self, record):
+        try:
+            line = self.format(record)
+            with self._records_lock:
+                if len(self._records) == self._records.maxlen:
+                    self.dropped += 1
+                self._records.append((record.levelno, line))
+        except Exception:
+            self.handleError(record)
+
+    def drain(self, max_records):
+        """Returns up to max_records (levelno, line) pairs, oldest first, without blocking."""
+        with self._records_lock:
+            count = min(max_records, len(self._records))
+            return [self._records.popleft() for _ in range(count)]
+
+class StreamToLogger:
+    """File-like object that forwards whole lines written to it (e.g. stray prints) to a logger."""
+    def __init__(self, logger, level):
+        self.logger = logger
+        self.level = level
+        self._buffer = ''
+
+    def write(self, message):
+        self._buffer += message
+        while '\n' in self._buffer:
+            line, self._buffer = self._buffer.split('\n', 1)
+            if line.strip():
+                self.logger.log(self.level, line.rstrip())
+
+    def flush(self):
+        if self._buffer.strip():
+            self.logger.log(self.level, self._buffer.rstrip())
+        self._buffer = ''
+
+def setup_logging(level=logging.INFO, log_file=None, redirect_std=True, buffer_lines=LOG_BUFFER_LINES):
+    """
+    Routes all logging to a QueueLogHandler holding up to buffer_lines records
+    (returned, for the GUI to drain), the
+    original console if there is one, and optionally a rotating log file (log_file,
+    or the SWITCH_RPC_LOG_FILE environment variable). With redirect_std, stray
+    writes to stdout/stderr become log records too.
+    """
+    formatter = logging.Formatter(LOG_FORMAT, DATE_FORMAT)
+    root = logging.getLogger()
+    root.setLevel(level)
+
+    queue_handler = QueueLogHandler(capacity=buffer_lines)
+    queue_handler.setFormatter(formatter)
+    root.addHandler(queue_handler)
+
+    # A windowed (--noconsole) build has no console at all
+    if sys.__stdout__ is not None:
+        console = logging.StreamHandler(sys.__stdout__)
+        console.setFormatter(formatter)
+        root.addHandler(console)
+
+    log_file = log_file or os.environ.get(LOG_FILE_ENV)
+    if log_file:
+        try:
+            file_handler = RotatingFileHandler(log_file, maxBytes=LOG_FILE_BYTES,
+                                               backupCount=LOG_FILE_BACKUPS, encoding='utf-8')
+            file_handler.setFormatter(formatter)
+            root.addHandler(file_handler)
+        except OSError as e:
+            root.warning(f"Could not open log file {log_file}: {e}")
+
+    if redirect_std:
+        sys.stdout = StreamToLogger(logging.getLogger('stdout'), logging.INFO)
+        sys.stderr = StreamToLogger(logging.getLogger('stderr'), logging.ERROR)
+
+    return queue_handler
@@ -0,0 +1,148 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+CACHE_FILE = 'lookup_cache.json'
+
+# Parsed GameTDB pages rarely change; a week keeps lookups instant without going stale for long
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 50000
+
+# Writes are coalesced: a burst of puts is saved once, this many seconds after the first
+SAVE_DELAY = 2.0
+
+class LookupCache:
+    """
+    Persistent cache of parsed GameTDB lookups ({'name', 'image_url', 'page_url'})
+    keyed by game ID. Entries expire after `ttl` seconds; the least recently used
+    ones are evicted beyond `max_entries`. With stale_while_revalidate, expired
+    entries are still handed out (flagged as stale) so the caller can refresh them
+    in the background, and keep working offline.
+    """
+    def __init__(self, path=CACHE_FILE, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES, stale_while_revalidate=True, save_delay=SAVE_DELAY):
+        self.path = path
+        self.save_delay = save_delay
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stale_while_revalidate = stale_while_revalidate
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._save_timer = None
+        self._save_lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                # Stored least recently used first
+                for key, entry in json.load(f):
+                    self._entries[key] = entry
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load {self.path}: {e}")
+
+    def save(self):
+        with self._lock:
+            if self._save_timer:
+                self._save_timer.cancel()
+                self._save_timer = None
+            data = list(self._entries.items())
+        tmp_path = self.path + '.tmp'
+        with self._save_lock:
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logger.warning(f"Could not save {self.path}: {e}")
+
+    def get(self, key):
+        """
+        Returns (value, fresh). value is None on a miss; fresh is False for an
+        expired entry, which is only returned in stale-while-revalidate mode.
+        """
+        key = key.upper()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, False
+
+            fresh = time.time() - entry['stored_at'] < self.ttl
+            if not fresh and not self.stale_while_revalidate:
+                del self._entries[key]
+                self.misses += 1
+                return None, False
+
+            self._entries.move_to_end(key)
+            if fresh:
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+            return entry['value'], fresh
+
+    def put(self, key, value):
+        key = key.upper()
+        with self._lock:
+            self._entries[key] = {'value': value, 'stored_at': time.time()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            if self.save_delay <= 0:
+                save_now = True
+            else:
+                save_now = False
+                if self._save_timer is None:
+                    self._save_timer = threading.Timer(self.save_delay, self.save)
+                    self._save_timer.daemon = True
+                    self._save_timer.start()
+        if save_now:
+            self.save()
+
+    def flush(self):
+        """Writes any pending changes to disk now."""
+        with self._lock:
+            pending = self._save_timer is not None
+        if pending:
+            self.save()
+
+    def is_fresh(self, key):
+        """True if key has an unexpired entry. Doesn't touch the counters or LRU order."""
+        with self._lock:
+            entry = self._entries.get(key.upper())
+            return entry is not None and time.time() - entry['stored_at'] < self.ttl
+
+    def __contains__(self, key):
+        with self._lock:
+            return key.upper() in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        self.save()
+
+    def stats(self):
+        """Hit/miss counters for inspection."""
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+        }
@@ -1,17 +1,35 @@
+import time
+_STARTED = time.perf_counter() # Startup report: measured from the very first import
+
 import customtkinter as ctk
+import logging
 import threading
-import requests
-from PIL import Image
-from io import BytesIO
+import queue
+from collections import deque
 from backend import SwitchRPCBackend
-from parse_xml import parse_xml
+from cover_cache import CoverCache, COVER_DIR, THUMB_SIZE
+from parse_xml import update_db
+from prefetch import prefetch, STATE_FILE
+from log_sink import setup_logging
+import metrics
+from presence_scheduler import PresenceScheduler, PROFILES_FILE
 import os
 
+_IMPORTED = time.perf_counter()
+
 ctk.set_appearance_mode("Dark")
 ctk.set_default_color_theme("blue")
 
 import sys
 
+logger = logging.getLogger(__name__)
+
+# The log view is refreshed on a timer: at most LOG_DRAIN_BATCH new lines per tick,
+# and only the newest LOG_MAX_LINES are kept in the widget
+LOG_DRAIN_INTERVAL_MS = 100
+LOG_DRAIN_BATCH = 200
+LOG_MAX_LINES = 1000
+
 # Function to handle paths in both dev and OneFile mode
 def resource_path(relative_path):
     # In OneFile mode, PyInstaller unpacks to sys._MEIPASS for bundled files
@@ -24,31 +42,176 @@ def resource_path(relative_path):
         base_path = os.path.abspath(".")
     return os.path.join(base_path, relative_path)
 
-# Class to redirect stdout/stderr to a text widget
-class PrintLogger:
-    def __init__(self, textbox):
-        self.textbox = textbox
-        self.terminal = sys.stdout
-
-    def write(self, message):
-        if self.terminal:
-            self.terminal.write(message)
-        # Safely update GUI on main thread
+# Debounced autocomplete that filters off the Tk main thread
+class AutocompleteScheduler:
+    def __init__(self, widget, matcher, on_results, delay_ms=120, history=200):
+        self.widget = widget
+        self.matcher = matcher
+        self.on_results = on_results
+        self.delay_ms = delay_ms
+        # (query, match_ms, total_ms) for the most recent delivered queries
+        self.latencies = deque(maxlen=history)
+        self.dropped = 0
+        self._generation = 0
+        self._after_id = None
+        self._queue = queue.Queue()
+        threading.Thread(target=self._worker, daemon=True).start()
+
+    def submit(self, query):
+        """Called on every keystroke (Tk thread). Only the last query in a burst is matched."""
+        self._generation += 1
+        if self._after_id:
+            self.widget.after_cancel(self._after_id)
+        self._after_id = self.widget.after(self.delay_ms, self._dispatch, self._generation, query, time.perf_counter())
+
+    def cancel(self):
+        """Drops any pending or in-flight query (e.g. the text got too short)."""
+        self._generation += 1
+        if self._after_id:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _dispatch(self, generation, query, typed_at):
+        self._after_id = None
+        self._queue.put((generation, query, typed_at))
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            # Skip straight to the newest query if several piled up
+            while not self._queue.empty():
+                self.dropped += 1
+                job = self._queue.get()
+
+            generation, query, typed_at = job
+            if generation != self._generation:
+                self.dropped += 1
+                continue
+
+            started = time.perf_counter()
+            try:
+                matches = self.matcher(query)
+            except Exception as e:
+                logger.error(f"Autocomplete failed: {e}")
+                continue
+            match_ms = (time.perf_counter() - started) * 1000
+            self.widget.after(0, self._deliver, generation, query, matches, typed_at, match_ms)
+
+    def _deliver(self, generation, query, matches, typed_at, match_ms):
+        # The user has typed past this query; its results are stale
+        if generation != self._generation:
+            self.dropped += 1
+            return
+        total_ms = (time.perf_counter() - typed_at) * 1000
+        self.latencies.append((query, match_ms, total_ms))
+        # Keystroke to suggestions on screen, debounce included
+        metrics.observe('ui.autocomplete', total_ms)
+        self.on_results(matches)
+
+    def stats(self):
+        """Summary of recent query latencies in milliseconds."""
+        if not self.latencies:
+            return {'queries': 0, 'dropped': self.dropped}
+        match_ms = sorted(l[1] for l in self.latencies)
+        total_ms = sorted(l[2] for l in self.latencies)
+        p95 = lambda values: values[min(len(values) - 1, int(len(values) * 0.95))]
+        return {
+            'queries': len(self.latencies),
+            'dropped': self.dropped,
+            'match_ms_avg': sum(match_ms) / len(match_ms),
+            'match_ms_p95': p95(match_ms),
+            'total_ms_avg': sum(total_ms) / len(total_ms),
+            'total_ms_p95': p95(total_ms),
+        }
+
+# Live metrics, exports and profiling captures; opened from the Diagnostics button
+class DiagnosticsWindow(ctk.CTkToplevel):
+    REFRESH_MS = 1000
+
+    def __init__(self, master):
+        super().__init__(master)
+        self.title("Diagnostics")
+        self.geometry("720x520")
+
+        self.tabs = ctk.CTkTabview(self)
+        self.tabs.pack(padx=10, pady=(10, 0), expand=True, fill="both")
+        self.metrics_box = ctk.CTkTextbox(self.tabs.add("Metrics"), font=("Consolas", 11))
+        self.metrics_box.pack(expand=True, fill="both")
+        self.profile_box = ctk.CTkTextbox(self.tabs.add("Profile"), font=("Consolas", 11))
+        self.profile_box.pack(expand=True, fill="both")
+        self.profile_box.insert("0.0", "Click \"Start Capture\", use the app, then \"Stop Capture\" to see where the time and memory went.")
+        self.profile_box.configure(state="disabled")
+
+        buttons = ctk.CTkFrame(self, fg_color="transparent")
+        buttons.pack(padx=10, pady=10, fill="x")
+        ctk.CTkButton(buttons, text="Export JSON", width=110, command=lambda: self.export('metrics.json', metrics.registry.to_json)).pack(side="left")
+        ctk.CTkButton(buttons, text="Export Prometheus", width=130, command=lambda: self.export('metrics.prom', metrics.registry.to_prometheus)).pack(side="left", padx=5)
+        self.btn_capture = ctk.CTkButton(buttons, text="Start Capture", width=110, command=self.toggle_capture)
+        self.btn_capture.pack(side="left")
+        self.status = ctk.CTkLabel(buttons, text="")
+        self.status.pack(side="left", padx=10)
+        if metrics.registry.capturing:
+            self.btn_capture.configure(text="Stop Capture")
+
+        self.refresh()
+
+    def refresh(self):
+        if not self.winfo_exists():
+            return
+        self._set_text(self.metrics_box, self._format(metrics.registry.snapshot()))
+        self.after(self.REFRESH_MS, self.refresh)
+
+    @staticmethod
+    def _format(snap):
+        lines = [f"{'timing':<28}{'count':>8}{'avg':>10}{'p50':>10}{'p95':>10}{'max':>10}  (ms)"]
+        for name, h in sorted(snap['histograms'].items()):
+            lines.append(f"{name:<28}{h['count']:>8}{h['avg_ms']:>10.1f}{h['p50_ms']:>10.1f}{h['p95_ms']:>10.1f}{h['max_ms']:>10.1f}")
+        lines.append("")
+        for name, value in sorted(snap['counters'].items()):
+            lines.append(f"{name:<28}{value:>8}")
+        for source, stats in sorted(snap['sources'].items()):
+            lines.append("")
+            lines.append(f"[{source}]")
+            for key, value in stats.items():
+                lines.append(f"  {key:<26}{value:.1f}" if isinstance(value, float) else f"  {key:<26}{value}")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _set_text(box, text):
+        box.configure(state="normal")
+        box.delete("0.0", "end")
+        box.insert("0.0", text)
+        box.configure(state="disabled")
+
+    def export(self, filename, render):
+        path = resource_path(filename)
         try:
-            # We use a trick if not on main thread:
-            # But standard Tkinter methods *might* be risky from threads.
-            # However, inserting into a widget from threads often causes issues.
-            # We'll assume simple usage for now, or wrap if needed.
-            self.textbox.configure(state="normal")
-            self.textbox.insert("end", message)
-            self.textbox.see("end")
-            self.textbox.configure(state="disabled")
-        except:
-             pass
-
-    def flush(self):
-        if self.terminal:
-            self.terminal.flush()
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(render())
+            self.status.configure(text=f"Saved {filename}", text_color="green")
+        except OSError as e:
+            logger.error(f"Could not write {path}: {e}")
+            self.status.configure(text=f"Could not save {filename}", text_color="red")
+
+    def toggle_capture(self):
+        if not metrics.registry.capturing:
+            metrics.registry.start_capture()
+            self.btn_capture.configure(text="Stop Capture")
+            self.status.configure(text="Capturing (the app runs slower meanwhile)...", text_color="yellow")
+            return
+        self.btn_capture.configure(state="disabled")
+        self.status.configure(text="Building report...", text_color="yellow")
+        # Comparing memory snapshots can take a moment; keep the window responsive
+        # The app outlives this window, so the report is handed back through it
+        threading.Thread(target=lambda: self.master.after(0, self._show_report, metrics.registry.stop_capture()), daemon=True).start()
+
+    def _show_report(self, report):
+        if not self.winfo_exists():
+            return
+        self._set_text(self.profile_box, report)
+        self.btn_capture.configure(text="Start Capture", state="normal")
+        self.status.configure(text="Capture finished", text_color="green")
+        self.tabs.set("Profile")
 
 class App(ctk.CTk):
     def __init__(self):
@@ -82,6 +245,7 @@ class App(ctk.CTk):
         
         # Bind key release for autocomplete
         self.entry_game._entry.bind("<KeyRelease>", self.check_autocomplete)
+        self.autocomplete = AutocompleteScheduler(self, lambda query: self.backend.autocomplete(query, 20), self._show_autocomplete)
 
         # Description Input
         self.entry_desc = ctk.CTkEntry(self.left_frame, placeholder_text="Description (e.g. Playing Online)")
@@ -95,13 +259,37 @@ class App(ctk.CTk):
         self.btn_update = ctk.CTkButton(self.left_frame, text="Set Presence", fg_color="green", hover_color="darkgreen", command=self.update_presence)
         self.btn_update.pack(pady=10, padx=20, fill="x")
 
+        # Presence profiles: save the current game, show a saved one, or rotate through them all
+        self.profile_frame = ctk.CTkFrame(self.left_frame, fg_color="transparent")
+        self.profile_frame.pack(pady=(0, 10), padx=20, fill="x")
+        self.option_profile = ctk.CTkOptionMenu(self.profile_frame, values=["No profiles"], width=140, command=self.apply_profile)
+        self.option_profile.pack(side="left", expand=True, fill="x")
+        self.btn_save_profile = ctk.CTkButton(self.profile_frame, text="Save", width=50, command=self.save_profile)
+        self.btn_save_profile.pack(side="left", padx=(5, 0))
+        self.btn_rotate = ctk.CTkButton(self.profile_frame, text="Rotate", width=60, command=self.toggle_rotation)
+        self.btn_rotate.pack(side="left", padx=(5, 0))
+
         self.btn_populate = ctk.CTkButton(self.left_frame, text="Populate Database (XML)", fg_color="gray", hover_color="darkgray", command=self.populate_db)
         self.btn_populate.pack(pady=10, padx=20, fill="x")
 
+        self.btn_prefetch = ctk.CTkButton(self.left_frame, text="Warm Cache (All Games)", fg_color="gray", hover_color="darkgray", command=self.prefetch_all)
+        self.btn_prefetch.pack(pady=(0, 10), padx=20, fill="x")
+
+        self.btn_diagnostics = ctk.CTkButton(self.left_frame, text="Diagnostics", fg_color="gray", hover_color="darkgray", command=self.open_diagnostics)
+        self.btn_diagnostics.pack(pady=(0, 10), padx=20, fill="x")
+        self.diagnostics = None
+        self._prefetch_stop = None
+
+        # Populate progress (only shown while the XML is being converted)
+        self.populate_progress = ctk.CTkProgressBar(self.left_frame)
+        self.populate_progress.set(0)
 
         # Status Label
-        self.status_label = ctk.CTkLabel(self.left_frame, text="Status: Ready", text_color="gray")
-        self.status_label.pack(pady=20)
+        self.status_label = ctk.CTkLabel(self.left_frame, text="Status: Loading game database...", text_color="yellow")
+        self.status_label.pack(pady=(20, 0))
+
+        self.discord_label = ctk.CTkLabel(self.left_frame, text="Discord: Connecting...", text_color="gray")
+        self.discord_label.pack(pady=(0, 20))
 
         # Right Frame: Info / Logs
         self.right_frame = ctk.CTkFrame(self)
@@ -126,18 +314,97 @@ class App(ctk.CTk):
         self.log_box.pack(pady=5, padx=20, expand=True, fill="both")
         self.log_box.configure(state="disabled")
         
-        # Redirect Output
-        sys.stdout = PrintLogger(self.log_box)
-        sys.stderr = PrintLogger(self.log_box)
+        # Route logging (and stray prints) to a queue that the GUI drains in batches
+        # Older lines than the view keeps would only be trimmed again, so buffer no more than that
+        self._log_handler = setup_logging(buffer_lines=LOG_MAX_LINES)
+        self._log_dropped = 0
+        self.after(LOG_DRAIN_INTERVAL_MS, self._drain_logs)
+
+        # Initialize Backend (Moved here so logs are captured).
+        # Fast start: the window comes up first; the DB loads and Discord connects in the background.
+        self.backend = SwitchRPCBackend(lazy=True, on_connection_change=lambda connected: self.after(0, self._show_discord_status, connected))
+
+        # Cover art: downloaded and resized off the main thread, cached on disk and in memory
+        self.cover_cache = CoverCache(
+            resource_path(COVER_DIR),
+            image_factory=lambda thumb: ctk.CTkImage(light_image=thumb, dark_image=thumb, size=THUMB_SIZE),
+        )
 
-        # Initialize Backend (Moved here so logs are captured)
-        self.backend = SwitchRPCBackend()
+        self.scheduler = PresenceScheduler(self.backend, resource_path(PROFILES_FILE), on_change=lambda profile: self.after(0, self._profile_shown, profile))
+        self._refresh_profiles()
 
         # State variables
         self.current_image_url = "switch" # Default asset
+        self.current_game_id = None
         self.game_db = self.backend.get_game_db() # List of dicts
-        self.all_titles = [g['title'] for g in self.game_db] if self.game_db else []
-        self.cached_id_map = {g['title']: g['id'] for g in self.game_db} if self.game_db else {}
+
+        # Nothing may rebuild the DB while it is still loading
+        self.btn_populate.configure(state="disabled")
+        self.btn_prefetch.configure(state="disabled")
+        threading.Thread(target=self._run_load_db, daemon=True).start()
+
+        self.startup_timings = {'imports_ms': (_IMPORTED - _STARTED) * 1000, 'window_ms': (time.perf_counter() - _STARTED) * 1000}
+        self.after_idle(self._first_frame)
+
+        metrics.register_source('startup', lambda: dict(self.startup_timings))
+        metrics.register_source('autocomplete', self.autocomplete.stats)
+        metrics.register_source('covers', self.cover_cache.stats)
+
+    def open_diagnostics(self):
+        if self.diagnostics is not None and self.diagnostics.winfo_exists():
+            self.diagnostics.focus()
+            return
+        self.diagnostics = DiagnosticsWindow(self)
+
+    def _drain_logs(self):
+        # Records are queued from any thread; only this Tk-side timer touches the widget
+        records = self._log_handler.drain(LOG_DRAIN_BATCH)
+        lines = [line for _, line in records]
+        dropped = self._log_handler.dropped - self._log_dropped
+        if dropped:
+            self._log_dropped += dropped
+            lines.insert(0, f"... {dropped} older log lines dropped (logging faster than the view updates; {self._log_dropped} in total)")
+        if lines:
+            self.log_box.configure(state="normal")
+            self.log_box.insert("end", "".join(line + "\n" for line in lines))
+            # Count the widget's own lines: one record (e.g. a traceback) can span several.
+            # The text ends with a newline, so "end-1c" sits on an empty last line.
+            excess = int(self.log_box.index("end-1c").split(".")[0]) - 1 - LOG_MAX_LINES
+            if excess > 0:
+                self.log_box.delete("1.0", f"{excess + 1}.0")
+            self.log_box.see("end")
+            self.log_box.configure(state="disabled")
+        self.after(LOG_DRAIN_INTERVAL_MS, self._drain_logs)
+
+    def _first_frame(self):
+        self.update_idletasks()
+        self.startup_timings['first_frame_ms'] = (time.perf_counter() - _STARTED) * 1000
+        t = self.startup_timings
+        logger.info(f"Startup: imports {t['imports_ms']:.0f} ms, window built {t['window_ms']:.0f} ms, first frame {t['first_frame_ms']:.0f} ms")
+
+    def _run_load_db(self):
+        try:
+            self.backend.load_db()
+        except Exception as e:
+            logger.warning(f"Could not load the game database: {e}")
+        self.startup_timings['db_ready_ms'] = (time.perf_counter() - _STARTED) * 1000
+        logger.info(f"Startup: game database ready after {self.startup_timings['db_ready_ms']:.0f} ms")
+        self.after(0, self._db_loaded)
+
+    def _db_loaded(self):
+        self.game_db = self.backend.get_game_db()
+        self.btn_populate.configure(state="normal")
+        self.btn_prefetch.configure(state="normal")
+        if self.game_db:
+            self.status_label.configure(text=f"Status: Ready ({len(self.game_db)} games)", text_color="gray")
+        else:
+            self.status_label.configure(text="Status: Ready (no local DB, use Populate Database)", text_color="gray")
+
+    def _show_discord_status(self, connected):
+        if connected:
+            self.discord_label.configure(text="Discord: Connected", text_color="green")
+        else:
+            self.discord_label.configure(text="Discord: Not running (retrying in background)", text_color="gray")
 
     def change_search_mode(self, choice):
         if choice == "ID":
@@ -148,24 +415,19 @@ class App(ctk.CTk):
 
     def check_autocomplete(self, event):
         if self.option_mode.get() == "ID":
+            self.autocomplete.cancel()
             return
             
         current_text = self.entry_game.get()
         if not current_text or len(current_text) < 2:
+            self.autocomplete.cancel()
             return
 
-        # Simple filter: case-insensitive containment
-        # Limit to top 20 for performance
-        query = current_text.lower()
-        matches = []
-        count = 0
-        for title in self.all_titles:
-            if query in title.lower():
-                matches.append(title)
-                count += 1
-                if count >= 20:
-                    break
-        
+        # Case-insensitive containment served by the backend's search index,
+        # prefix matches first. Matching is debounced and runs on a worker thread.
+        self.autocomplete.submit(current_text)
+
+    def _show_autocomplete(self, matches):
         self.entry_game.configure(values=matches)
         
     def on_game_select(self, choice):
@@ -197,17 +459,15 @@ class App(ctk.CTk):
             self.entry_game.set(result['name'])
             
             self.current_image_url = result['image_url']
+            self.current_game_id = result['page_url'].rsplit('/', 1)[-1]
             
-            # Display Image
-            try:
-                response = requests.get(result['image_url'])
-                img_data = Image.open(BytesIO(response.content))
-                # Resize for display (keep aspect ratio roughly)
-                ctk_image = ctk.CTkImage(light_image=img_data, dark_image=img_data, size=(160, 260))
+            # Display Image (never blocks: cached in memory, or loaded in the background)
+            ctk_image = self.cover_cache.get_cached(result['image_url'])
+            if ctk_image:
                 self.image_label.configure(image=ctk_image, text="")
-            except Exception as e:
-                print(f"Failed to load image: {e}")
-                self.image_label.configure(image=None, text="[Image Load Failed]")
+            else:
+                self.image_label.configure(image=None, text="Loading cover...")
+                self.cover_cache.load(result['image_url'], lambda url, image, error: self.after(0, self._show_cover, url, image, error))
 
             # Update info box
             self.info_box.configure(state="normal")
@@ -222,6 +482,16 @@ class App(ctk.CTk):
             self.info_box.insert("0.0", "No results found on GameTDB.\nTry using the Game ID directly (e.g. AAACA).")
             self.info_box.configure(state="disabled")
 
+    def _show_cover(self, url, image, error):
+        # Ignore covers that arrive after the user moved on to another game
+        if url != self.current_image_url:
+            return
+        if image:
+            self.image_label.configure(image=image, text="")
+        else:
+            logger.error(f"Failed to load image: {error}")
+            self.image_label.configure(image=None, text="[Image Load Failed]")
+
     def update_presence(self):
         game = self.entry_game.get()
         desc = self.entry_desc.get()
@@ -232,8 +502,13 @@ class App(ctk.CTk):
 
         if not desc or len(desc) < 2:
             desc = "Playing"
-            
-        self.backend.update_presence(
+
+        # A manually set presence takes over from a running rotation
+        if self.scheduler.rotating:
+            self.scheduler.stop()
+            self.btn_rotate.configure(text="Rotate")
+
+        future = self.backend.update_presence(
             state=desc,
             details=game,
             large_image=self.current_image_url,
@@ -241,7 +516,60 @@ class App(ctk.CTk):
             small_image="online", # Default status icon
             small_text="Online"
         )
-        self.status_label.configure(text=f"Status: Presence Set '{game}'", text_color="cyan")
+        if not future.done():
+            waiting = "Sending presence..." if self.backend.connected else "Waiting for Discord..."
+            self.status_label.configure(text=f"Status: {waiting}", text_color="yellow")
+        future.add_done_callback(lambda f: self.after(0, self._presence_result, f, game))
+
+    def _presence_result(self, future, game):
+        if future.exception():
+            self.status_label.configure(text="Status: Presence update failed", text_color="red")
+        elif future.result():
+            self.status_label.configure(text=f"Status: Presence Set '{game}'", text_color="cyan")
+
+    def _refresh_profiles(self):
+        names = list(self.scheduler.profiles)
+        self.option_profile.configure(values=names or ["No profiles"])
+        self.option_profile.set(names[-1] if names else "No profiles")
+
+    def save_profile(self):
+        game = self.entry_game.get()
+        if not game:
+            self.status_label.configure(text="Status: Game name required", text_color="red")
+            return
+        desc = self.entry_desc.get() or "Playing"
+        name = f"{game} - {desc}"
+        self.scheduler.save_profile({
+            'name': name,
+            'game_id': self.current_game_id,
+            'details': game,
+            'state': desc,
+            'large_image': self.current_image_url if self.current_image_url != "switch" else None,
+        })
+        self._refresh_profiles()
+        self.status_label.configure(text=f"Status: Saved profile '{name}'", text_color="green")
+
+    def apply_profile(self, name):
+        if name not in self.scheduler.profiles:
+            return
+        self.scheduler.apply(name)
+        self.btn_rotate.configure(text="Rotate")
+
+    def toggle_rotation(self):
+        if self.scheduler.rotating:
+            self.scheduler.stop()
+            self.btn_rotate.configure(text="Rotate")
+            self.status_label.configure(text="Status: Rotation stopped", text_color="yellow")
+            return
+        if not self.scheduler.profiles:
+            self.status_label.configure(text="Status: Save a profile first", text_color="red")
+            return
+        self.scheduler.play()
+        self.btn_rotate.configure(text="Stop")
+
+    def _profile_shown(self, profile):
+        self.option_profile.set(profile['name'])
+        self.status_label.configure(text=f"Status: Presence Set '{profile['details']}' (profile)", text_color="cyan")
 
     def populate_db(self):
         xml_path = resource_path('switchtdb.xml')
@@ -250,22 +578,85 @@ class App(ctk.CTk):
              return
              
         self.status_label.configure(text="Status: Parsing XML...", text_color="yellow")
+        # A populate reloads the DB under a cache warm-up; never run both at once
         self.btn_populate.configure(state="disabled")
-        threading.Thread(target=self._run_populate, daemon=True).start()
+        self.btn_prefetch.configure(state="disabled")
+        self.populate_progress.set(0)
+        self.populate_progress.pack(pady=(0, 10), padx=20, fill="x", after=self.btn_populate)
+        threading.Thread(target=self._run_populate, args=(xml_path,), daemon=True).start()
+
+    def _populate_progress(self, bytes_read, total_bytes, games_parsed):
+        # Called from the worker thread; hand the update to the Tk thread
+        fraction = bytes_read / total_bytes if total_bytes else 1
+        self.after(0, self._show_populate_progress, fraction, games_parsed)
+
+    def _show_populate_progress(self, fraction, games_parsed):
+        self.populate_progress.set(fraction)
+        self.status_label.configure(text=f"Status: Parsing XML... {games_parsed} games ({fraction:.0%})", text_color="yellow")
 
-    def _run_populate(self):
+    def _run_populate(self, xml_path):
         try:
-            parse_xml()
-            # Reload DB
-            self.game_db = self.backend.reload_db()
-            self.all_titles = [g['title'] for g in self.game_db] if self.game_db else []
+            delta = update_db(progress_callback=self._populate_progress, input_file=xml_path, output_file=resource_path('games.json'))
+            if delta is None:
+                raise RuntimeError("XML conversion failed")
+            # Apply only what changed instead of reloading the whole DB
+            self.backend.apply_db_delta(delta)
+            self.game_db = self.backend.get_game_db()
             self.after(0, lambda: self.status_label.configure(text=f"Status: DB Updated ({len(self.game_db)} games)", text_color="green"))
         except Exception as e:
-            print(e)
+            logger.error(e)
             self.after(0, lambda: self.status_label.configure(text="Status: XML Parse Failed", text_color="red"))
         finally:
-             self.after(0, lambda: self.btn_populate.configure(state="normal"))
+             self.after(0, self._populate_done)
+
+    def _populate_done(self):
+        self.btn_populate.configure(state="normal")
+        self.btn_prefetch.configure(state="normal")
+        self.populate_progress.pack_forget()
+
+    def prefetch_all(self):
+        # A second click stops a running prefetch; it resumes from where it left off next time
+        if self._prefetch_stop:
+            self._prefetch_stop.set()
+            self.btn_prefetch.configure(state="disabled")
+            return
+        if not self.game_db:
+            self.status_label.configure(text="Status: Populate the database first", text_color="red")
+            return
+
+        self._prefetch_stop = threading.Event()
+        self.btn_prefetch.configure(text="Stop Warming Cache")
+        self.btn_populate.configure(state="disabled")
+        self.status_label.configure(text="Status: Warming cache...", text_color="yellow")
+        self.populate_progress.set(0)
+        self.populate_progress.pack(pady=(0, 10), padx=20, fill="x", after=self.btn_prefetch)
+        threading.Thread(target=self._run_prefetch, args=(self._prefetch_stop,), daemon=True).start()
+
+    def _prefetch_progress(self, finished, total, failed, rate):
+        fraction = finished / total if total else 1
+        self.after(0, self.populate_progress.set, fraction)
+        self.after(0, lambda: self.status_label.configure(text=f"Status: Warming cache {finished}/{total} ({rate:.1f}/s, {failed} failed)", text_color="yellow"))
+
+    def _run_prefetch(self, stop_event):
+        try:
+            summary = prefetch(self.backend, cover_cache=self.cover_cache, state_path=resource_path(STATE_FILE),
+                               progress_callback=self._prefetch_progress, stop_event=stop_event)
+            text = f"Status: Cache warmed ({summary['fetched']} fetched, {summary['failed']} failed)"
+            self.after(0, lambda: self.status_label.configure(text=text, text_color="green"))
+        except Exception as e:
+            logger.error(e)
+            self.after(0, lambda: self.status_label.configure(text="Status: Cache warm-up failed", text_color="red"))
+        finally:
+            self.after(0, self._prefetch_done)
+
+    def _prefetch_done(self):
+        self._prefetch_stop = None
+        self.btn_prefetch.configure(text="Warm Cache (All Games)", state="normal")
+        self.btn_populate.configure(state="normal")
+        self.populate_progress.pack_forget()
 
 if __name__ == "__main__":
     app = App()
     app.mainloop()
+    app.scheduler.close()
+    app.backend.close()
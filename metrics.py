@@ -0,0 +1,259 @@
+import cProfile
+import functools
+import io
+import json
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+from bisect import bisect_left
+from collections import deque
+
+# Histogram bucket upper bounds in milliseconds; the last bucket is everything slower
+BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Recent samples kept per histogram for exact percentiles
+RECENT_SAMPLES = 500
+
+PROMETHEUS_PREFIX = 'switch_rpc_'
+
+class Histogram:
+    """Latency distribution in fixed buckets, plus the most recent samples for percentiles."""
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+    def observe(self, ms):
+        self.counts[bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.sum_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.recent.append(ms)
+
+    def summary(self):
+        recent = sorted(self.recent)
+        pick = lambda q: recent[min(len(recent) - 1, int(len(recent) * q))] if recent else 0.0
+        return {
+            'count': self.count,
+            'sum_ms': self.sum_ms,
+            'avg_ms': self.sum_ms / self.count if self.count else 0.0,
+            'p50_ms': pick(0.5),
+            'p95_ms': pick(0.95),
+            'max_ms': self.max_ms,
+            'buckets': dict(zip([str(b) for b in BUCKETS_MS] + ['+Inf'], self.counts)),
+        }
+
+class _Capture:
+    """An active cProfile/tracemalloc capture; see start_capture()."""
+    def __init__(self, cpu, memory):
+        self.cpu = cpu
+        self.memory = memory
+        self.started = time.perf_counter()
+        self.stats = None
+        self.lock = threading.Lock()
+        self.snapshot = None
+        if memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(10)
+                self.owns_tracemalloc = True
+            else:
+                self.owns_tracemalloc = False
+            self.snapshot = tracemalloc.take_snapshot()
+
+    def add_profile(self, profile):
+        with self.lock:
+            if self.stats is None:
+                self.stats = pstats.Stats(profile)
+            else:
+                self.stats.add(profile)
+
+    def report(self, top=25):
+        out = io.StringIO()
+        out.write(f"Capture of {time.perf_counter() - self.started:.1f}s\n")
+        if self.cpu:
+            out.write("\n== CPU (instrumented calls, by cumulative time) ==\n")
+            with self.lock:
+                if self.stats is None:
+                    out.write("No instrumented calls ran during the capture.\n")
+                else:
+                    self.stats.stream = out
+                    self.stats.sort_stats('cumulative').print_stats(top)
+        if self.memory:
+            out.write("\n== Memory growth since the capture started ==\n")
+            # Leave out what the capture itself allocated
+            snapshot = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, pstats.__file__),
+                tracemalloc.Filter(False, cProfile.__file__),
+                tracemalloc.Filter(False, tracemalloc.__file__),
+            ])
+            current, peak = tracemalloc.get_traced_memory()
+            out.write(f"Traced now {current / 1048576:.1f} MB, peak {peak / 1048576:.1f} MB\n")
+            for stat in snapshot.compare_to(self.snapshot, 'lineno')[:top]:
+                out.write(f"{stat}\n")
+            if self.owns_tracemalloc:
+                tracemalloc.stop()
+        return out.getvalue()
+
+class Registry:
+    """
+    Counters, latency histograms and pluggable stats sources for the whole app.
+    Thread-safe; recording costs a lock and a few additions.
+    """
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.sources = {}
+        self.capture = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name, ms):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(ms)
+
+    def span(self, name):
+        """Context manager timing a block into histogram `name`."""
+        return _Span(self, name)
+
+    def timed(self, name):
+        """Decorator form of span()."""
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with _Span(self, name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def register_source(self, name, stats_fn):
+        """Adds a stats() callable (returning a flat dict) to every snapshot, e.g. a cache's stats."""
+        with self._lock:
+            self.sources[name] = stats_fn
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = {name: h.summary() for name, h in self.histograms.items()}
+            sources = dict(self.sources)
+        source_stats = {}
+        for name, stats_fn in sources.items():
+            try:
+                source_stats[name] = stats_fn()
+            except Exception as e:
+                source_stats[name] = {'error': str(e)}
+        return {'counters': counters, 'histograms': histograms, 'sources': source_stats}
+
+    def to_json(self, indent=2):
+        return json.dumps(self.snapshot(), indent=indent, default=str)
+
+    def to_prometheus(self):
+        """Prometheus text exposition format; histograms are exported in seconds."""
+        snap = self.snapshot()
+        lines = []
+        for name, value in sorted(snap['counters'].items()):
+            metric = _metric_name(name) + '_total'
+            lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+        for name, h in sorted(snap['histograms'].items()):
+            metric = _metric_name(name) + '_seconds'
+            lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, count in h['buckets'].items():
+                cumulative += count
+                le = bound if bound == '+Inf' else repr(float(bound) / 1000)
+                lines.append(f'{metric}_bucket{{le="{le}"}} {cumulative}')
+            lines.append(f"{metric}_sum {h['sum_ms'] / 1000}")
+            lines.append(f"{metric}_count {h['count']}")
+        for source, stats in sorted(snap['sources'].items()):
+            for key, value in sorted(stats.items()):
+                if isinstance(value, bool):
+                    value = int(value)
+                if isinstance(value, (int, float)):
+                    metric = _metric_name(f"{source}_{key}")
+                    lines += [f"# TYPE {metric} gauge", f"{metric} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def start_capture(self, cpu=True, memory=True):
+        """
+        Starts profiling. cpu=True runs every instrumented call (on any thread)
+        under cProfile; memory=True traces allocations with tracemalloc.
+        Both slow the app down noticeably, so only capture while investigating.
+        """
+        with self._lock:
+            if self.capture is not None:
+                raise RuntimeError("A capture is already running")
+            self.capture = _Capture(cpu, memory)
+
+    def stop_capture(self, top=25):
+        """Stops profiling and returns the report as text."""
+        with self._lock:
+            capture, self.capture = self.capture, None
+        if capture is None:
+            raise RuntimeError("No capture is running")
+        return capture.report(top)
+
+    @property
+    def capturing(self):
+        return self.capture is not None
+
+class _Span:
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+        self.profile = None
+
+    def __enter__(self):
+        capture = self.registry.capture
+        local = self.registry._local
+        # Only the outermost span on a thread profiles, so nested spans aren't counted twice
+        if capture is not None and capture.cpu and not getattr(local, 'profiling', False):
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Another profiler already owns this thread
+                profile = None
+            if profile is not None:
+                local.profiling = True
+                self.capture = capture
+                self.profile = profile
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed_ms = (time.perf_counter() - self.started) * 1000
+        if self.profile is not None:
+            self.profile.disable()
+            self.registry._local.profiling = False
+            self.capture.add_profile(self.profile)
+        self.registry.observe(self.name, elapsed_ms)
+        if exc_type is not None:
+            self.registry.count(self.name + '.errors')
+        return False
+
+def _metric_name(name):
+    return PROMETHEUS_PREFIX + re.sub(r'[^a-zA-Z0-9_]', '_', name)
+
+# The process-wide registry every module records into
+registry = Registry()
+
+count = registry.count
+observe = registry.observe
+span = registry.span
+timed = registry.timed
+register_source = registry.register_source
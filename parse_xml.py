@@ -1,54 +1,322 @@
 import xml.etree.ElementTree as ET
 import json
+import hashlib
+import logging
 import os
+import time
+import metrics
+from game_index import IndexWriter, install_index, VERSION as INDEX_VERSION
+
+logger = logging.getLogger(__name__)
 
 INPUT_FILE = 'switchtdb.xml'
 OUTPUT_FILE = 'games.json'
 
-def parse_xml():
-    if not os.path.exists(INPUT_FILE):
-        print(f"Error: {INPUT_FILE} not found.")
-        return
+# How often (in games) the progress callback is invoked while streaming.
+PROGRESS_INTERVAL = 250
+
+# Fields stored per game in the binary index ('s' string, 'l' list of strings)
+INDEX_FIELDS = (('id', 's'), ('title', 's'), ('cover_regions', 'l'), ('aliases', 'l'))
+
+# Bump when _game_record changes shape; a build in any other format is redone in full
+RECORD_VERSION = 1
+
+# GameTDB box art lives at a predictable URL per art region
+COVER_URLS = (
+    'https://art.gametdb.com/switch/coverHQ/{region}/{id}.jpg',
+    'https://art.gametdb.com/switch/cover/{region}/{id}.jpg',
+)
+
+# Art regions to try for a switchtdb.xml <region>, most likely first
+REGION_ART = {
+    'NTSC-U': ['US'],
+    'PAL': ['EN'],
+    'NTSC-J': ['JA'],
+    'NTSC-K': ['KO'],
+    'NTSC-T': ['ZH'],
+    'NTSC-C': ['ZH'],
+    'ALL': ['US', 'EN', 'JA'],
+}
+
+# Art regions for the <languages> a game ships with
+LANGUAGE_ART = {
+    'EN': 'EN', 'FR': 'FR', 'DE': 'DE', 'ES': 'ES', 'IT': 'IT', 'NL': 'NL',
+    'PT': 'PT', 'RU': 'RU', 'JA': 'JA', 'KO': 'KO', 'ZHCN': 'ZH', 'ZHTW': 'ZH',
+}
+
+MAX_COVER_REGIONS = 4
+
+def cover_regions(region, languages):
+    """Art regions to look for a game's cover in, by region priority then language."""
+    regions = list(REGION_ART.get(region or '', []))
+    for lang in (languages or '').split(','):
+        art = LANGUAGE_ART.get(lang.strip().upper())
+        if art and art not in regions:
+            regions.append(art)
+    return regions[:MAX_COVER_REGIONS] or ['US', 'EN']
+
+def cover_urls(game_id, regions):
+    """Candidate box art URLs for a game: HQ covers for every region first, then regular ones."""
+    return [pattern.format(region=region, id=game_id) for pattern in COVER_URLS for region in regions]
+
+def _game_record(game):
+    """
+    Builds the {'id', 'title', 'cover_regions', 'aliases'} record for a single <game> element.
+    aliases holds the titles of every other locale, plus the name attribute when it differs.
+    """
+    id_elem = game.find('id')
+    game_id = id_elem.text if id_elem is not None else None
+
+    # Find English title, and collect every locale's title on the way
+    title = None
+    locale_titles = []
+    for locale in game.findall('locale'):
+        locale_title = (locale.findtext('title') or '').strip()
+        if not locale_title:
+            continue
+        if title is None and locale.get('lang') == 'EN':
+            title = locale_title
+        locale_titles.append(locale_title)
+
+    # Fallback to name attribute if no EN title found
+    name = (game.get('name') or '').strip()
+    if not title:
+        title = name
+
+    if game_id and title:
+        # Locales often repeat the English title; keep each spelling once
+        seen = {title.lower()}
+        aliases = []
+        for alias in locale_titles + [name]:
+            if alias and alias.lower() not in seen:
+                seen.add(alias.lower())
+                aliases.append(alias)
+        return {
+            'id': game_id,
+            'title': title,
+            'cover_regions': cover_regions(game.findtext('region'), game.findtext('languages')),
+            'aliases': aliases,
+        }
+    return None
 
-    print(f"Parsing {INPUT_FILE}...")
-    
-    games = []
-    
+def iter_games(xml_file):
+    """
+    Streams game records out of an open (binary) switchtdb.xml file.
+    Each <game> element is cleared from the tree once handled, so the XML
+    tree never grows with the size of the dump.
+    """
+    root = None
+    for event, elem in ET.iterparse(xml_file, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = elem
+            continue
+        if elem.tag != 'game':
+            continue
+
+        record = _game_record(elem)
+        if record:
+            yield record
+
+        # Drop the handled element (and anything before it) from the root
+        root.clear()
+
+def _index_path(output_file):
+    return os.path.splitext(output_file)[0] + '.idx'
+
+def _manifest_path(output_file):
+    return os.path.splitext(output_file)[0] + '.manifest.json'
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _record_hash(record):
+    return hashlib.sha1(json.dumps(record, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+def _build_format():
+    # Everything that decides what a build writes besides the XML itself, as it reads back from JSON
+    return {'records': RECORD_VERSION, 'index': INDEX_VERSION, 'index_fields': [list(field) for field in INDEX_FIELDS]}
+
+def _load_manifest(output_file):
+    """
+    Returns the manifest of the previous build, or None if there isn't a usable one.
+    A build written by another version (e.g. before aliases were indexed) doesn't
+    count, even if the XML is unchanged, so upgrading always rebuilds in full.
+    """
+    if not os.path.exists(output_file):
+        return None
     try:
-        # Use iterparse for memory efficiency if the file is huge, 
-        # but 20MB is fine for standard parse.
-        tree = ET.parse(INPUT_FILE)
-        root = tree.getroot()
-        
-        for game in root.findall('game'):
-            game_id = game.find('id').text
-            
-            # Find English title
-            title = None
-            
-            # Look for locale lang="EN"
-            for locale in game.findall('locale'):
-                if locale.get('lang') == 'EN':
-                    title_elem = locale.find('title')
-                    if title_elem is not None:
-                        title = title_elem.text
-                    break
-            
-            # Fallback to name attribute if no EN title found
-            if not title:
-                title = game.get('name')
-                
-            if game_id and title:
-                games.append({'id': game_id, 'title': title})
-                
-        print(f"Parsed {len(games)} games.")
-        
-        with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-            json.dump(games, f, indent=4)
-        print(f"Saved to {OUTPUT_FILE}")
-        
+        with open(_manifest_path(output_file), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('format') != _build_format():
+        logger.info("The previous build is in an older format; it will be redone.")
+        return None
+    return manifest
+
+def _save_manifest(output_file, xml_info, game_hashes, total):
+    path = _manifest_path(output_file)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump({'format': _build_format(), 'xml': xml_info, 'total': total, 'games': game_hashes}, f)
+    os.replace(path + '.tmp', path)
+
+def _xml_info(input_file, sha256=None):
+    stat = os.stat(input_file)
+    return {
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'sha256': sha256 or _file_sha256(input_file),
+    }
+
+@metrics.timed('xml.convert')
+def _convert(input_file, output_file, progress_callback=None, previous_hashes=None):
+    """
+    Streams input_file into output_file (and its games.idx index) and hashes
+    every record on the way.
+    When previous_hashes is given, the games that were added, changed or removed
+    relative to it are collected, and output_file is left untouched if nothing changed.
+    Returns (game_hashes, delta).
+
+    Trade-offs: the XML is streamed, but memory still grows with the catalogue,
+    since the per-game hashes (for the manifest), the index's sort keys and the
+    delta's records are held until the end (roughly 1 MB per 1k games). And when
+    anything changed, games.json and games.idx are rewritten in full: both are
+    sorted/packed files, so patching them in place would cost as much as writing
+    them. What stays incremental is everything after the build: the manifest
+    skips unchanged dumps, and the app applies only the delta to what it holds.
+    """
+    total_bytes = os.path.getsize(input_file)
+    tmp_file = output_file + '.tmp'
+    game_hashes = {}
+    delta = {'added': [], 'changed': [], 'removed': [], 'full': previous_hashes is None}
+    count = 0
+    index = IndexWriter(_index_path(output_file), INDEX_FIELDS)
+
+    try:
+        with open(input_file, 'rb') as xml_file, open(tmp_file, 'w', encoding='utf-8') as out:
+            out.write('[')
+            for record in iter_games(xml_file):
+                out.write(',\n    ' if count else '\n    ')
+                out.write(json.dumps(record))
+                index.add(record)
+                count += 1
+
+                record_hash = _record_hash(record)
+                game_hashes[record['id']] = record_hash
+                if previous_hashes is not None:
+                    old_hash = previous_hashes.get(record['id'])
+                    if old_hash is None:
+                        delta['added'].append(record)
+                    elif old_hash != record_hash:
+                        delta['changed'].append(record)
+
+                if progress_callback and count % PROGRESS_INTERVAL == 0:
+                    progress_callback(xml_file.tell(), total_bytes, count)
+            out.write('\n]\n' if count else ']\n')
+
+        if previous_hashes is not None:
+            delta['removed'] = [game_id for game_id in previous_hashes if game_id not in game_hashes]
+
+        if previous_hashes is None or delta['added'] or delta['changed'] or delta['removed']:
+            # Only replace the previous DB once the new one is complete
+            os.replace(tmp_file, output_file)
+            install_index(index.close(), _index_path(output_file))
+        else:
+            os.remove(tmp_file)
+            index.discard()
+    except Exception:
+        index.discard()
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+
+    if progress_callback:
+        progress_callback(total_bytes, total_bytes, count)
+
+    delta['total'] = count
+    metrics.count('xml.games', count)
+    return game_hashes, delta
+
+def parse_xml(progress_callback=None, input_file=INPUT_FILE, output_file=OUTPUT_FILE):
+    """
+    Converts switchtdb.xml into games.json, writing records as they are parsed.
+    progress_callback(bytes_read, total_bytes, games_parsed) is called periodically.
+    Returns the number of games written, or None on failure.
+    """
+    if not os.path.exists(input_file):
+        logger.error(f"{input_file} not found.")
+        return None
+
+    logger.info(f"Parsing {input_file}...")
+    started = time.perf_counter()
+
+    try:
+        game_hashes, delta = _convert(input_file, output_file, progress_callback)
+        _save_manifest(output_file, _xml_info(input_file), game_hashes, delta['total'])
+
+        logger.info(f"Parsed {delta['total']} games in {time.perf_counter() - started:.2f}s.")
+        logger.info(f"Saved to {output_file}")
+        return delta['total']
+
+    except Exception as e:
+        logger.error(f"Error parsing XML: {e}")
+        return None
+
+def update_db(progress_callback=None, input_file=INPUT_FILE, output_file=OUTPUT_FILE):
+    """
+    Incrementally refreshes games.json from switchtdb.xml.
+    The dump is skipped outright when its size/mtime or SHA-256 match the previous
+    build; otherwise each game is compared against the previous build by content hash.
+    Returns a delta dict {'added': [records], 'changed': [records], 'removed': [ids],
+    'total': n, 'full': bool}, or None on failure. 'full' is True when there was no
+    previous build to compare against and every game is new.
+    """
+    if not os.path.exists(input_file):
+        logger.error(f"{input_file} not found.")
+        return None
+
+    manifest = _load_manifest(output_file)
+    if manifest is None:
+        logger.info("No previous build found, doing a full conversion.")
+        count = parse_xml(progress_callback, input_file, output_file)
+        if count is None:
+            return None
+        return {'added': [], 'changed': [], 'removed': [], 'total': count, 'full': True}
+
+    try:
+        old_xml = manifest.get('xml', {})
+        old_hashes = manifest.get('games', {})
+        unchanged = {'added': [], 'changed': [], 'removed': [], 'total': manifest.get('total', len(old_hashes)), 'full': False}
+
+        stat = os.stat(input_file)
+        if stat.st_size == old_xml.get('size') and stat.st_mtime == old_xml.get('mtime'):
+            logger.info(f"{input_file} unchanged since last build.")
+            return unchanged
+
+        xml_sha256 = _file_sha256(input_file)
+        if xml_sha256 == old_xml.get('sha256'):
+            # Same content, just touched; remember the new mtime so the next check is cheap
+            _save_manifest(output_file, _xml_info(input_file, xml_sha256), old_hashes, unchanged['total'])
+            logger.info(f"{input_file} unchanged since last build.")
+            return unchanged
+
+        logger.info(f"Parsing {input_file} (incremental)...")
+        started = time.perf_counter()
+        game_hashes, delta = _convert(input_file, output_file, progress_callback, old_hashes)
+        _save_manifest(output_file, _xml_info(input_file, xml_sha256), game_hashes, delta['total'])
+
+        logger.info(f"{len(delta['added'])} added, {len(delta['changed'])} changed, {len(delta['removed'])} removed ({delta['total']} games) in {time.perf_counter() - started:.2f}s.")
+        return delta
+
     except Exception as e:
-        print(f"Error parsing XML: {e}")
+        logger.error(f"Error parsing XML: {e}")
+        return None
 
 if __name__ == "__main__":
+    logging.basicConfig(format='%(message)s', level=logging.INFO)
     parse_xml()
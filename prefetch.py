@@ -0,0 +1,157 @@
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = 'prefetch_state.json'
+
+# How often (in finished items) progress is reported and the resume state saved
+REPORT_INTERVAL = 25
+
+def _load_state(state_path):
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        return set(state.get('done', [])), dict(state.get('failed', {}))
+    except FileNotFoundError:
+        return set(), {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not load {state_path}, starting over: {e}")
+        return set(), {}
+
+def _save_state(state_path, done, failed):
+    tmp_path = state_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'done': sorted(done), 'failed': failed}, f)
+    os.replace(tmp_path, state_path)
+
+def _all_game_ids(backend):
+    game_db = backend.get_game_db()
+    if hasattr(game_db, 'iter_field'):
+        return list(game_db.iter_field('id'))
+    return [game['id'] for game in game_db]
+
+def prefetch(backend, game_ids=None, workers=8, cover_cache=None, state_path=STATE_FILE,
+             progress_callback=None, stop_event=None):
+    """
+    Warms the lookup cache (and the cover cache, if given) for game_ids, or for the
+    whole local DB. Pages are fetched and parsed on a bounded thread pool and each
+    result is streamed into the caches as it completes.
+
+    Progress is saved to state_path, so an interrupted run resumes where it left
+    off; games that already have a fresh cache entry are skipped too.
+    progress_callback(finished, total, failed, items_per_sec) is called periodically.
+    Set stop_event to stop early. Returns a summary dict.
+    """
+    game_ids = [game_id.upper() for game_id in (game_ids or _all_game_ids(backend))]
+    done, failed = _load_state(state_path) if state_path else (set(), {})
+
+    todo = []
+    skipped = 0
+    for game_id in game_ids:
+        if game_id in done or (cover_cache is None and backend.lookup_cache.is_fresh(game_id)):
+            skipped += 1
+        else:
+            todo.append(game_id)
+
+    if len(game_ids) > backend.lookup_cache.max_entries:
+        logger.warning(f"{len(game_ids)} games but the lookup cache holds {backend.lookup_cache.max_entries}; older entries will be evicted.")
+
+    logger.info(f"Prefetching {len(todo)} games ({skipped} already done) with {workers} workers...")
+    total = len(todo)
+    finished = 0
+    started = time.perf_counter()
+
+    def fetch(game_id):
+        result = backend.fetch_game(game_id, refresh=True)
+        if result is None:
+            raise LookupError("not found on GameTDB")
+        if cover_cache is not None and result['image_url'].startswith(('http://', 'https://')):
+            cover_cache.warm(result['image_url'])
+        return game_id
+
+    def report():
+        elapsed = time.perf_counter() - started
+        rate = finished / elapsed if elapsed else 0.0
+        if progress_callback:
+            progress_callback(finished, total, len(failed), rate)
+        return rate
+
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='prefetch')
+    try:
+        futures = {pool.submit(fetch, game_id): game_id for game_id in todo}
+        for future in as_completed(futures):
+            game_id = futures[future]
+            try:
+                future.result()
+                done.add(game_id)
+                failed.pop(game_id, None)
+            except Exception as e:
+                failed[game_id] = str(e)
+            finished += 1
+
+            if finished % REPORT_INTERVAL == 0:
+                report()
+                if state_path:
+                    _save_state(state_path, done, failed)
+            if stop_event is not None and stop_event.is_set():
+                logger.warning("Prefetch stopped; run again to resume.")
+                break
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        backend.lookup_cache.flush()
+        if state_path:
+            if finished == total and not failed:
+                # Complete: next run starts fresh (the cache TTL decides what to refetch)
+                if os.path.exists(state_path):
+                    os.remove(state_path)
+            else:
+                _save_state(state_path, done, failed)
+
+    rate = report()
+    summary = {
+        'total': len(game_ids),
+        'fetched': finished - len(failed.keys() & set(todo)),
+        'skipped': skipped,
+        'failed': len(failed),
+        'elapsed': time.perf_counter() - started,
+        'items_per_sec': rate,
+    }
+    logger.info(f"Prefetch finished: {summary['fetched']} fetched, {summary['skipped']} skipped, "
+                f"{summary['failed']} failed in {summary['elapsed']:.1f}s ({rate:.1f} items/sec)")
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm the GameTDB lookup and cover caches for the local game DB.")
+    parser.add_argument('ids', nargs='*', help="game IDs to prefetch (default: every game in games.json)")
+    parser.add_argument('--workers', type=int, default=8, help="concurrent fetches (default: 8)")
+    parser.add_argument('--no-covers', action='store_true', help="only fetch pages, skip cover art")
+    parser.add_argument('--restart', action='store_true', help="ignore saved progress from an interrupted run")
+    args = parser.parse_args()
+    logging.basicConfig(format='%(message)s', level=logging.INFO)
+
+    from backend import SwitchRPCBackend
+
+    if args.restart and os.path.exists(STATE_FILE):
+        os.remove(STATE_FILE)
+
+    backend = SwitchRPCBackend()
+    cover_cache = None
+    if not args.no_covers:
+        from cover_cache import CoverCache, COVER_DIR
+        cover_cache = CoverCache(COVER_DIR, http_client=backend.http)
+
+    def progress(finished, total, failed, rate):
+        logger.info(f"  {finished}/{total} done, {failed} failed, {rate:.1f} items/sec")
+
+    try:
+        prefetch(backend, args.ids or None, args.workers, cover_cache, progress_callback=progress)
+    except KeyboardInterrupt:
+        logger.warning("Interrupted; progress saved, run again to resume.")
+
+if __name__ == "__main__":
+    main()
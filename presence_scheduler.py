@@ -0,0 +1,265 @@
+import heapq
+import itertools
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+PROFILES_FILE = 'profiles.json'
+
+# How long each profile is shown in a rotation, unless it sets its own 'duration'
+DEFAULT_DURATION = 300
+# Discord allows 5 updates per 20 seconds; a rotation never switches faster than this
+MIN_DURATION = 15
+
+def _checked_duration(profile):
+    """Returns profile with a usable 'duration' (profiles.json is edited by hand), or DEFAULT_DURATION."""
+    duration = profile.get('duration')
+    if duration is None or duration == '':
+        return profile
+    try:
+        seconds = float(duration)
+    except (TypeError, ValueError):
+        seconds = math.nan
+    if isinstance(duration, bool) or not math.isfinite(seconds):
+        logger.warning(f"Profile '{profile.get('name')}' has an invalid duration {duration!r}; using {DEFAULT_DURATION}s")
+        seconds = DEFAULT_DURATION
+    return dict(profile, duration=seconds)
+
+def load_profiles(path=PROFILES_FILE):
+    """Returns the saved profiles as {name: profile}, in the order they were saved."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return {profile['name']: _checked_duration(profile) for profile in json.load(f)}
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.warning(f"Could not load {path}: {e}")
+        return {}
+
+def save_profiles(profiles, path=PROFILES_FILE):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(list(profiles.values()), f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+class TimerHeap:
+    """
+    Runs callbacks at given times on one thread, however many are scheduled.
+    Timers live in a heap ordered by due time; the thread sleeps until the
+    earliest one. Cancelled timers are dropped lazily when they come due.
+    """
+    def __init__(self, name='presence-timers'):
+        self._heap = []
+        self._counter = itertools.count()
+        self._cancelled = set()
+        self._closing = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def call_later(self, delay, callback, *args):
+        """Schedules callback(*args) in delay seconds; returns a handle for cancel()."""
+        handle = next(self._counter)
+        with self._cond:
+            heapq.heappush(self._heap, (time.monotonic() + delay, handle, callback, args))
+            self._cond.notify()
+        return handle
+
+    def cancel(self, handle):
+        with self._cond:
+            if any(entry[1] == handle for entry in self._heap):
+                self._cancelled.add(handle)
+
+    def close(self, timeout=5):
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closing and (not self._heap or self._heap[0][0] > time.monotonic()):
+                    self._cond.wait(self._heap[0][0] - time.monotonic() if self._heap else None)
+                if self._closing:
+                    return
+                _, handle, callback, args = heapq.heappop(self._heap)
+                if handle in self._cancelled:
+                    self._cancelled.discard(handle)
+                    continue
+            try:
+                callback(*args)
+            except Exception as e:
+                logger.error(f"Scheduled presence task failed: {e}")
+
+class PresenceScheduler:
+    """
+    Saved presence profiles and timed rotations on top of SwitchRPCBackend.
+
+    A profile is a dict: {'name', 'game_id', 'details', 'state', 'large_image',
+    'large_text', 'small_image', 'small_text', 'duration'}; only 'name' and either
+    'game_id' or 'details' are required. Missing title and cover art are filled in
+    from the local DB and lookup cache when a profile is applied or a rotation
+    starts, so a scheduled switch is a single RPC call. Games not cached yet are
+    fetched in the background, well before their turn.
+
+    Every presence carries a `start` timestamp so Discord shows the elapsed time;
+    it only resets when the game changes, not when a rotation moves on to another
+    profile for the same game.
+
+    on_change(profile) is called from the timer thread whenever a profile is applied.
+    """
+    def __init__(self, backend, path=PROFILES_FILE, on_change=None):
+        self.backend = backend
+        self.path = path
+        self.on_change = on_change
+        self.profiles = load_profiles(path)
+        self.current = None
+        self._playlist = []
+        self._position = 0
+        self._loop = True
+        self._next = None
+        # Bumped on every stop(), so a timer that already fired for an old rotation does nothing
+        self._generation = 0
+        self._game = None
+        self._started_at = None
+        self._resolved = {}
+        self._lock = threading.Lock()
+        self._timers = TimerHeap()
+
+    def save_profile(self, profile):
+        if not profile.get('name'):
+            raise ValueError("A profile needs a name")
+        if not profile.get('game_id') and not profile.get('details'):
+            raise ValueError("A profile needs a game ID or a game name")
+        with self._lock:
+            self.profiles[profile['name']] = _checked_duration(dict(profile))
+            self._resolved.pop(profile['name'], None)
+            save_profiles(self.profiles, self.path)
+
+    def delete_profile(self, name):
+        with self._lock:
+            if self.profiles.pop(name, None) is not None:
+                self._resolved.pop(name, None)
+                save_profiles(self.profiles, self.path)
+
+    @property
+    def rotating(self):
+        return bool(self._playlist)
+
+    def apply(self, name):
+        """Shows one profile now, stopping any rotation."""
+        self.stop()
+        self._show(self._resolve(self.profiles[name]))
+
+    def play(self, names=None, loop=True):
+        """
+        Rotates through the named profiles (default: all, in saved order), each for
+        its 'duration' in seconds. With loop=False the last one stays up at the end.
+        """
+        names = list(names or self.profiles)
+        if not names:
+            raise ValueError("No profiles to rotate through")
+        self.stop()
+        # Resolve everything up front so no switch waits on a lookup
+        playlist = [self._resolve(self.profiles[name], fetch_missing=True) for name in names]
+        with self._lock:
+            self._playlist = playlist
+            self._position = 0
+            self._loop = loop
+            generation = self._generation
+        self._advance(generation)
+
+    def stop(self):
+        with self._lock:
+            self._playlist = []
+            self._generation += 1
+            if self._next is not None:
+                self._timers.cancel(self._next)
+                self._next = None
+
+    def clear(self):
+        self.stop()
+        with self._lock:
+            self.current = self._game = self._started_at = None
+        return self.backend.clear_presence()
+
+    def close(self):
+        self.stop()
+        self._timers.close()
+
+    def _advance(self, generation):
+        with self._lock:
+            if generation != self._generation or not self._playlist:
+                return
+            profile = self._playlist[self._position]
+            self._position += 1
+            if self._position >= len(self._playlist):
+                if not self._loop:
+                    self._playlist = []
+                self._position = 0
+            if self._playlist and len(self._playlist) > 1:
+                duration = max(MIN_DURATION, float(profile.get('duration') or DEFAULT_DURATION))
+                self._next = self._timers.call_later(duration, self._advance, generation)
+            else:
+                self._next = None
+        # A background fetch may have filled in the cover since the rotation started
+        self._show(self._resolved.get(profile['name'], profile))
+
+    def _show(self, profile):
+        with self._lock:
+            game = profile.get('game_id') or profile['details']
+            if game != self._game:
+                self._game = game
+                self._started_at = int(time.time())
+            self.current = profile
+            start = self._started_at
+
+        self.backend.update_presence(
+            state=profile.get('state') or "Playing",
+            details=profile['details'],
+            large_image=profile.get('large_image') or "switch",
+            large_text=profile.get('large_text') or profile['details'],
+            small_image=profile.get('small_image') or "online",
+            small_text=profile.get('small_text') or "Online",
+            start=start,
+        )
+        if self.on_change:
+            self.on_change(profile)
+
+    def _resolve(self, profile, fetch_missing=False):
+        """
+        Returns a copy of profile with its title and cover filled in from the
+        local DB and lookup cache (never the network). With fetch_missing, games
+        that aren't cached are looked up in the background for later switches.
+        """
+        resolved = dict(profile)
+        game_id = profile.get('game_id')
+        if game_id and not (resolved.get('details') and resolved.get('large_image')):
+            cached, _ = self.backend.lookup_cache.get(game_id)
+            if cached:
+                if not resolved.get('details'):
+                    resolved['details'] = cached['name']
+                if not resolved.get('large_image') and cached['image_url'].startswith(('http://', 'https://')):
+                    resolved['large_image'] = cached['image_url']
+            elif fetch_missing:
+                threading.Thread(target=self._fetch, args=(profile['name'], game_id), daemon=True).start()
+            if not resolved.get('details'):
+                game = self.backend.lookup_by_id(game_id)
+                resolved['details'] = game['title'] if game else game_id
+        self._resolved[profile['name']] = resolved
+        return resolved
+
+    def _fetch(self, name, game_id):
+        try:
+            if self.backend.fetch_game(game_id):
+                profile = self.profiles.get(name)
+                if profile:
+                    self._resolve(profile)
+        except Exception as e:
+            logger.warning(f"Could not look up {game_id} for profile '{name}': {e}")
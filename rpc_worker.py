@@ -0,0 +1,191 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+# Discord accepts at most 5 presence updates per 20 seconds per client
+RATE_LIMIT = 5
+RATE_WINDOW = 20.0
+
+# Reconnect backoff in seconds: doubles after every failed attempt, up to the max
+BACKOFF_MIN = 1.0
+BACKOFF_MAX = 60.0
+
+class PresenceWorker:
+    """
+    Owns the Discord RPC connection on a dedicated thread, so callers never block
+    on connects or sends. While disconnected it keeps reconnecting in the background.
+
+    update() / clear() return a Future. Only the latest request is kept: if a newer
+    one arrives before an older one was sent, the older Future resolves to False
+    (superseded) and only the newer one goes out. Sends are spaced to stay within
+    Discord's rate limit, and a lost or missing connection is retried in the
+    background with exponential backoff. A sent request resolves to True; a send
+    error is set on the Future.
+
+    presence_factory(client_id) must return an object with connect(), update(**kwargs),
+    clear() and close(), e.g. pypresence.Presence or a fake for tests.
+    """
+    def __init__(self, client_id, presence_factory, rate_limit=RATE_LIMIT, rate_window=RATE_WINDOW,
+                 backoff_min=BACKOFF_MIN, backoff_max=BACKOFF_MAX, on_connection_change=None):
+        self.client_id = client_id
+        self.presence_factory = presence_factory
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+
+        self.connected = False
+        # Optional callable(connected), invoked from the worker thread when the connection changes
+        self.on_connection_change = on_connection_change
+        self.sent = 0
+        self.superseded = 0
+        self.last_error = None
+
+        self._rpc = None
+        self._reported = None
+        self._pending = None
+        self._closing = False
+        self._send_times = deque()
+        self._backoff = backoff_min
+        self._next_connect = 0.0
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='discord-rpc', daemon=True)
+        self._thread.start()
+
+    def update(self, **kwargs):
+        """Queues a presence update; returns a Future resolving to True (sent) or False (superseded)."""
+        return self._submit('update', kwargs)
+
+    def clear(self):
+        """Queues clearing the presence; same Future semantics as update()."""
+        return self._submit('clear', {})
+
+    def _submit(self, kind, kwargs):
+        future = Future()
+        with self._cond:
+            if self._closing:
+                future.set_exception(RuntimeError("Presence worker is closed"))
+                return future
+            if self._pending:
+                self._pending[2].set_result(False)
+                self.superseded += 1
+            self._pending = (kind, kwargs, future)
+            self._cond.notify()
+        return future
+
+    def close(self, timeout=5):
+        """Stops the worker; a request that was never sent resolves to False."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+        self._thread.join(timeout)
+
+    def _run(self):
+        # Connect straight away so the first update doesn't wait for it
+        self._connect()
+        while True:
+            with self._cond:
+                while not self._closing and not self._ready_to_send():
+                    self._cond.wait(self._wait_time())
+                if self._closing:
+                    break
+                if not self.connected:
+                    job = None
+                else:
+                    job, self._pending = self._pending, None
+
+            if job is None:
+                self._connect()
+            else:
+                self._send(*job)
+
+        with self._cond:
+            if self._pending:
+                self._pending[2].set_result(False)
+                self._pending = None
+        self._disconnect()
+
+    def _ready_to_send(self):
+        # While disconnected, wake up to reconnect even with nothing to send
+        now = time.monotonic()
+        if not self.connected:
+            return now >= self._next_connect
+        if not self._pending:
+            return False
+        while self._send_times and now - self._send_times[0] >= self.rate_window:
+            self._send_times.popleft()
+        return len(self._send_times) < self.rate_limit
+
+    def _wait_time(self):
+        now = time.monotonic()
+        if not self.connected:
+            return max(0.0, self._next_connect - now)
+        if not self._pending:
+            return None
+        if len(self._send_times) >= self.rate_limit:
+            return max(0.0, self._send_times[0] + self.rate_window - now)
+        return 0.0
+
+    def _connect(self):
+        try:
+            self._rpc = self.presence_factory(self.client_id)
+            self._rpc.connect()
+            self._set_connected(True)
+            self._backoff = self.backoff_min
+            self.last_error = None
+            logger.info("Connected to Discord RPC")
+        except Exception as e:
+            self._disconnect()
+            self.last_error = e
+            self._next_connect = time.monotonic() + self._backoff
+            logger.warning(f"Failed to connect to Discord RPC: {e} (retrying in {self._backoff:.0f}s)")
+            self._backoff = min(self._backoff * 2, self.backoff_max)
+
+    def _disconnect(self):
+        if self._rpc:
+            try:
+                self._rpc.close()
+            except Exception:
+                pass
+        self._rpc = None
+        self._set_connected(False)
+
+    def _set_connected(self, connected):
+        # The first attempt is always reported, later ones only when the state flips
+        changed = connected != self._reported
+        self._reported = connected
+        self.connected = connected
+        if changed and self.on_connection_change:
+            try:
+                self.on_connection_change(connected)
+            except Exception as e:
+                logger.error(f"Connection callback failed: {e}")
+
+    def _send(self, kind, kwargs, future):
+        try:
+            if kind == 'clear':
+                self._rpc.clear()
+            else:
+                self._rpc.update(**kwargs)
+            with self._cond:
+                self._send_times.append(time.monotonic())
+            self.sent += 1
+            future.set_result(True)
+        except Exception as e:
+            # The pipe is likely gone (Discord closed); reconnect before the next send
+            self.last_error = e
+            self._disconnect()
+            self._next_connect = time.monotonic()
+            future.set_exception(e)
+
+    def stats(self):
+        return {
+            'connected': self.connected,
+            'sent': self.sent,
+            'superseded': self.superseded,
+            'last_error': str(self.last_error) if self.last_error else None,
+        }
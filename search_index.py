@@ -0,0 +1,306 @@
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from heapq import merge
+
+# Default number of suggestions returned for a query
+DEFAULT_LIMIT = 20
+
+# Fuzzy search: time budget per query, candidates scored, and the weakest score accepted
+FUZZY_BUDGET_MS = 30
+FUZZY_CANDIDATES = 300
+FUZZY_MIN_SCORE = 0.6
+# Candidates come from each query word's rarest trigrams: any in at most this many
+# titles, or at most twice as many as the word's rarest; collecting never takes
+# over half the budget
+FUZZY_MAX_POSTINGS = 5000
+FUZZY_COLLECT_SHARE = 0.5
+_COLLECT_CHUNK = 4096
+
+# Marks acronym trigrams in the inverted index so they never collide with title trigrams
+_ACRONYM = '^'
+
+_WORD = re.compile(r'[^\W_]+')
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def _words(text):
+    return _WORD.findall(text)
+
+def _acronym(words):
+    return ''.join(word[0] for word in words)
+
+def _max_typos(token):
+    if len(token) < 4:
+        return 0
+    return 1 if len(token) < 7 else 2
+
+def bounded_edit_distance(a, b, bound):
+    """
+    Optimal string alignment distance (edits plus adjacent swaps) between a and b,
+    or bound + 1 as soon as it is known to exceed bound.
+    """
+    if abs(len(a) - len(b)) > bound:
+        return bound + 1
+    prev_prev = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        row = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            row[j] = min(prev[j] + 1, row[j - 1] + 1, prev[j - 1] + cost)
+            if prev_prev is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                row[j] = min(row[j], prev_prev[j - 2] + 1)
+        if min(row) > bound:
+            return bound + 1
+        prev_prev, prev = prev, row
+    return prev[-1]
+
+def _token_score(token, words, acronym, lower):
+    """How well one query token matches a title, from 0 (no match) to 1 (whole word)."""
+    if token in words:
+        return 1.0
+    if any(word.startswith(token) for word in words):
+        return 0.9
+    if len(token) >= 3 and token in acronym:
+        return 0.85
+    typos = _max_typos(token)
+    if typos:
+        best = min(bounded_edit_distance(token, word, typos) for word in words) if words else typos + 1
+        if best <= typos:
+            return 0.8 - 0.15 * best
+    if len(token) >= 3 and token in lower:
+        return 0.6
+    return 0.0
+
+class SearchIndex:
+    """
+    Keystroke autocomplete over the game titles, built once per DB load and
+    kept up to date with add() and remove() when a DB delta is applied.
+
+    - A sorted array of lower-cased titles answers prefix queries with a binary search.
+    - A trigram inverted index (trigram -> title numbers) narrows substring queries
+      down to the titles that share the query's rarest trigram. Two-letter queries
+      use a bigram map (bigram -> the trigrams containing it): any title with the
+      bigram past its start contains one of those trigrams, so merging their
+      postings finds every match without storing bigram postings of its own.
+
+    Results are deduplicated (titles repeat across regions) and ranked with
+    prefix matches first, then other substring matches in DB order.
+
+    fuzzy() adds typo-tolerant, token-based ranking on top of the same trigram
+    index; title acronyms (e.g. "totk") are indexed alongside the trigrams.
+
+    Every title is reference-counted, since several games share one. A title
+    whose last game is removed is only tombstoned: its title number stays in
+    the postings (readers skip it) and is reused if the title comes back.
+    """
+    def __init__(self, titles):
+        self._titles = []
+        self._lower = []
+        self._refs = array('I')
+        self._pos = {}
+        for title in titles:
+            key = title.lower()
+            pos = self._pos.get(key)
+            if pos is not None:
+                self._refs[pos] += 1
+                continue
+            self._pos[key] = len(self._lower)
+            self._titles.append(title)
+            self._lower.append(key)
+            self._refs.append(1)
+        self._live = len(self._lower)
+        self._lock = threading.Lock()
+
+        order = sorted(range(len(self._lower)), key=self._lower.__getitem__)
+        self._sorted_keys = [self._lower[i] for i in order]
+        self._sorted_pos = array('I', order)
+
+        self._trigrams = {}
+        self._bigrams = {}
+        for pos, key in enumerate(self._lower):
+            self._index_key(pos, key)
+
+    def _index_key(self, pos, key):
+        for gram in _trigrams(key):
+            postings = self._trigrams.get(gram)
+            if postings is None:
+                postings = self._trigrams[gram] = array('I')
+                for bigram in {gram[:2], gram[1:]}:
+                    self._bigrams.setdefault(bigram, []).append(postings)
+            postings.append(pos)
+        for gram in _trigrams(_acronym(_words(key))):
+            postings = self._trigrams.get(_ACRONYM + gram)
+            if postings is None:
+                postings = self._trigrams[_ACRONYM + gram] = array('I')
+            postings.append(pos)
+
+    def __len__(self):
+        return self._live
+
+    def add(self, title):
+        """Adds one occurrence of title (e.g. for a game added by a DB delta)."""
+        key = title.lower()
+        with self._lock:
+            pos = self._pos.get(key)
+            if pos is None:
+                pos = self._pos[key] = len(self._lower)
+                self._titles.append(title)
+                self._lower.append(key)
+                self._refs.append(1)
+                self._index_key(pos, key)
+            elif self._refs[pos]:
+                self._refs[pos] += 1
+                return
+            else:
+                # Bring a tombstoned title back; its postings were never dropped
+                self._titles[pos] = title
+                self._lower[pos] = key
+                self._refs[pos] = 1
+            i = bisect_left(self._sorted_keys, key)
+            self._sorted_keys.insert(i, key)
+            self._sorted_pos.insert(i, pos)
+            self._live += 1
+
+    def remove(self, title):
+        """Removes one occurrence of title; it stops matching once no game has it."""
+        key = title.lower()
+        with self._lock:
+            pos = self._pos.get(key)
+            if pos is None or not self._refs[pos]:
+                return
+            self._refs[pos] -= 1
+            if self._refs[pos]:
+                return
+            self._titles[pos] = None
+            self._lower[pos] = None
+            i = bisect_left(self._sorted_keys, key)
+            del self._sorted_keys[i]
+            del self._sorted_pos[i]
+            self._live -= 1
+
+    def prefix(self, query, limit=DEFAULT_LIMIT):
+        """Titles starting with query, in alphabetical order."""
+        with self._lock:
+            return self._prefix(query, limit)
+
+    def _prefix(self, query, limit):
+        key = query.lower()
+        matches = []
+        i = bisect_left(self._sorted_keys, key)
+        while i < len(self._sorted_keys) and len(matches) < limit and self._sorted_keys[i].startswith(key):
+            matches.append(self._sorted_pos[i])
+            i += 1
+        return [self._titles[pos] for pos in matches]
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """Top `limit` titles containing query, prefix matches first."""
+        key = query.lower()
+        if not key:
+            return []
+
+        with self._lock:
+            return self._search(key, limit)
+
+    def _search(self, key, limit):
+        results = self._prefix(key, limit)
+        if len(results) >= limit:
+            return results
+
+        taken = set(results)
+        for pos in self._candidates(key):
+            lower = self._lower[pos]
+            if lower is not None and key in lower and not lower.startswith(key):
+                title = self._titles[pos]
+                if title not in taken:
+                    results.append(title)
+                    if len(results) >= limit:
+                        break
+        return results
+
+    def _candidates(self, key):
+        """Title numbers that may contain key, smallest posting list first."""
+        if len(key) == 1:
+            # Too short for any gram; the scan stops as soon as `limit` hits are found
+            return range(len(self._lower))
+        if len(key) == 2:
+            return self._merged(self._bigrams.get(key, ()))
+
+        grams = _trigrams(key)
+        postings = [self._trigrams.get(gram) for gram in grams]
+        if any(p is None for p in postings):
+            return ()
+        return min(postings, key=len)
+
+    @staticmethod
+    def _merged(postings):
+        # Title numbers in order, once each, from several sorted posting lists
+        last = None
+        for pos in merge(*postings):
+            if pos != last:
+                last = pos
+                yield pos
+
+    def fuzzy(self, query, limit=DEFAULT_LIMIT, budget_ms=FUZZY_BUDGET_MS, min_score=FUZZY_MIN_SCORE):
+        """
+        Typo-tolerant ranked search, e.g. "zelda totk" or "metriod dread".
+        Candidates are the titles sharing the most of the query's rarer trigrams
+        (or acronym trigrams); they are scored best-first until budget_ms runs out,
+        so a query never takes much longer than its budget.
+        """
+        started = time.perf_counter()
+        tokens = _words(query.lower())
+        if not tokens:
+            return []
+
+        with self._lock:
+            hits = self._fuzzy_candidates(tokens, started + budget_ms * FUZZY_COLLECT_SHARE / 1000)
+            return self._fuzzy(query, tokens, hits, limit, started + budget_ms / 1000, min_score)
+
+    def _fuzzy_candidates(self, tokens, deadline):
+        """Counts shared trigrams per title, reading posting lists smallest first until the deadline."""
+        selected = {}
+        for token in tokens:
+            found = [p for gram in _trigrams(token) for p in (self._trigrams.get(gram), self._trigrams.get(_ACRONYM + gram)) if p]
+            found.sort(key=len)
+            for postings in found:
+                if len(postings) <= max(FUZZY_MAX_POSTINGS, 2 * len(found[0])):
+                    selected[id(postings)] = postings
+
+        hits = Counter()
+        for postings in sorted(selected.values(), key=len):
+            for start in range(0, len(postings), _COLLECT_CHUNK):
+                hits.update(postings[start:start + _COLLECT_CHUNK])
+                if time.perf_counter() > deadline:
+                    return hits
+        return hits
+
+    def _fuzzy(self, query, tokens, hits, limit, deadline, min_score):
+        if not hits:
+            # Only very short tokens; the plain prefix search is the best we can do
+            return self._prefix(query, limit)
+
+        scored = []
+        for n, (pos, _) in enumerate(hits.most_common(FUZZY_CANDIDATES)):
+            if n % 8 == 0 and time.perf_counter() > deadline:
+                break
+            lower = self._lower[pos]
+            if lower is None:
+                continue
+            words = _words(lower)
+            acronym = _acronym(words)
+            score = sum(_token_score(token, words, acronym, lower) for token in tokens) / len(tokens)
+            if score >= min_score:
+                # Prefer titles that start with the query (typos allowed) and have few unmatched words
+                if words and _token_score(tokens[0], words[:1], '', words[0]) >= 0.65:
+                    score += 0.05
+                score -= 0.01 * max(0, len(words) - len(tokens))
+                scored.append((-score, len(lower), pos))
+
+        scored.sort()
+        return [self._titles[pos] for _, _, pos in scored[:limit]]
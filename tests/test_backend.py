@@ -0,0 +1,65 @@
+import threading
+
+from backend import SwitchRPCBackend
+from game_index import GameIndex
+from parse_xml import update_db
+
+class NullPresence:
+    def __init__(self, client_id):
+        pass
+
+    def connect(self):
+        pass
+
+    def update(self, **kwargs):
+        pass
+
+    def clear(self):
+        pass
+
+    def close(self):
+        pass
+
+def write_switchtdb(path, games):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<datafile>\n')
+        for n in range(games):
+            f.write(f'<game name="Game {n}"><id>{n:05X}</id><type>Switch</type><region>NTSC-U</region>'
+                    f'<locale lang="EN"><title>Game {n}</title></locale></game>\n')
+        f.write('</datafile>\n')
+
+def test_lookups_keep_working_while_the_db_reloads(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_switchtdb('switchtdb.xml', 2000)
+    update_db()
+    backend = SwitchRPCBackend(presence_factory=NullPresence)
+    assert isinstance(backend.get_game_db(), GameIndex)
+
+    errors = []
+    misses = []
+    stop = threading.Event()
+
+    def read():
+        n = 0
+        while not stop.is_set():
+            n = (n + 1) % 2000
+            try:
+                if backend.lookup_by_id(f"{n:05X}") is None or backend.lookup_by_title(f"Game {n}") is None:
+                    misses.append(n)
+            except Exception as e:
+                errors.append(e)
+
+    readers = [threading.Thread(target=read) for _ in range(3)]
+    for reader in readers:
+        reader.start()
+    try:
+        for _ in range(30):
+            backend.reload_db()
+    finally:
+        stop.set()
+        for reader in readers:
+            reader.join()
+        backend.close()
+
+    assert errors == []
+    assert misses == []
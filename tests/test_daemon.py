@@ -0,0 +1,147 @@
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+from backend import SwitchRPCBackend
+from daemon import ControlServer
+
+GAMES = [
+    {'id': 'AAACA', 'title': "Super Mario Odyssey"},
+    {'id': 'AAAAB', 'title': "Mario Kart 8 Deluxe"},
+    {'id': 'AXN7A', 'title': "Metroid Dread"},
+]
+
+class FakePresence:
+    def __init__(self):
+        self.sent = []
+
+    def __call__(self, client_id):
+        return self
+
+    def connect(self):
+        pass
+
+    def update(self, **kwargs):
+        self.sent.append(('update', kwargs))
+
+    def clear(self):
+        self.sent.append(('clear', {}))
+
+    def close(self):
+        pass
+
+class OfflineHttp:
+    def request(self, method, url, **kwargs):
+        raise ConnectionError(f"Offline test: {method} {url}")
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    # The backend keeps games.json and its caches in the working directory
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'games.json').write_text(json.dumps(GAMES), encoding='utf-8')
+    fake = FakePresence()
+    backend = SwitchRPCBackend(http_client=OfflineHttp(), presence_factory=fake)
+    server = ControlServer(backend, port=0)
+    server.start()
+    yield server, fake
+    server.shutdown()
+    server.server_close()
+    backend.close()
+
+def call(server, method, path, body=None, content_type='application/json'):
+    data = None if body is None else (body if isinstance(body, bytes) else json.dumps(body).encode('utf-8'))
+    request = urllib.request.Request(server.url + path, data=data, method=method)
+    if data is not None:
+        request.add_header('Content-Type', content_type)
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+def test_status(api):
+    server, _ = api
+    status, body = call(server, 'GET', '/status')
+    assert status == 200
+    assert body['games'] == len(GAMES)
+    assert body['db_ready'] is True
+
+def test_search_returns_ids(api):
+    server, _ = api
+    status, body = call(server, 'GET', '/search?q=mario&limit=5')
+    assert status == 200
+    assert {'id': 'AAACA', 'title': "Super Mario Odyssey"} in body['matches']
+    assert {'id': 'AAAAB', 'title': "Mario Kart 8 Deluxe"} in body['matches']
+
+def test_lookup_served_from_cache(api):
+    server, _ = api
+    server.backend.lookup_cache.put('AXN7A', {'name': "Metroid Dread", 'image_url': 'switch',
+                                              'page_url': "https://www.gametdb.com/Switch/AXN7A"})
+    status, body = call(server, 'GET', '/lookup?q=AXN7A')
+    assert status == 200
+    assert body['name'] == "Metroid Dread"
+
+def test_presence_is_sent(api):
+    server, fake = api
+    status, body = call(server, 'POST', '/presence', {'details': "Metroid Dread", 'start': 1700000000})
+    assert (status, body) == (200, {'sent': True})
+    kind, sent = fake.sent[-1]
+    assert kind == 'update'
+    assert sent['details'] == "Metroid Dread"
+    assert sent['large_text'] == "Metroid Dread"
+    assert sent['start'] == 1700000000
+
+@pytest.mark.parametrize('body', [
+    {'details': "Metroid Dread", 'wait': "x"},
+    {'details': "Metroid Dread", 'start': "abc"},
+    {'details': "Metroid Dread", 'start': -5},
+    {'details': "Metroid Dread", 'wait': True},
+    {'state': "Playing"},
+])
+def test_invalid_presence_is_rejected_before_sending(api, body):
+    server, fake = api
+    status, response = call(server, 'POST', '/presence', body)
+    assert status == 400
+    assert 'error' in response
+    # Nothing was queued: the next request goes out on its own
+    assert call(server, 'POST', '/clear')[0] == 200
+    assert fake.sent == [('clear', {})]
+    assert server.backend.presence.stats()['superseded'] == 0
+
+def test_post_requires_json(api):
+    server, fake = api
+    status, _ = call(server, 'POST', '/presence', b'details=Metroid', content_type='application/x-www-form-urlencoded')
+    assert status == 400
+    assert fake.sent == []
+
+def test_invalid_input_is_a_bad_request(api):
+    server, _ = api
+    assert call(server, 'GET', '/search?q=mario&limit=x')[0] == 400
+    assert call(server, 'POST', '/presence', b'{not json')[0] == 400
+
+def test_internal_errors_are_not_blamed_on_the_client(api, monkeypatch):
+    server, _ = api
+    def broken(title):
+        raise ValueError("mmap closed or invalid")
+    monkeypatch.setattr(server.backend, 'lookup_by_title', broken)
+    status, body = call(server, 'GET', '/search?q=mario')
+    assert status == 500
+    assert body['error'] == "mmap closed or invalid"
+
+def test_only_one_reload_runs_at_a_time(api):
+    server, _ = api
+    with server.reload_lock:
+        status, body = call(server, 'POST', '/reload', {'rebuild': True})
+    assert status == 409
+    status, body = call(server, 'POST', '/reload')
+    assert status == 200
+    assert body['games'] == len(GAMES)
+
+def test_unknown_endpoint(api):
+    server, _ = api
+    assert call(server, 'GET', '/nope')[0] == 404
@@ -0,0 +1,103 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from http_client import HttpClient
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits[self.path] = server.hits.get(self.path, 0) + 1
+            hits = server.hits[self.path]
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            if self.path == '/slow':
+                time.sleep(0.2)
+            if self.path == '/flaky' and hits < 3:
+                self._send(503, b'busy')
+            elif self.path == '/missing':
+                self._send(404, b'not found')
+            else:
+                self._send(200, self.headers.get('User-Agent', '').encode('utf-8'))
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.hits = {}
+    server.active = server.max_active = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_get_records_timings(server):
+    client = HttpClient(backoff=0)
+    try:
+        response = client.get(server.url + '/hello')
+        assert response.status_code == 200
+        assert response.text.startswith('Mozilla/5.0')
+        stats = client.stats()
+        assert stats['requests'] == 1
+        assert stats['errors'] == 0
+        assert client.timings[-1][:3] == ('GET', server.url + '/hello', 200)
+    finally:
+        client.close()
+
+def test_retries_server_errors(server):
+    client = HttpClient(backoff=0)
+    try:
+        assert client.get(server.url + '/flaky').status_code == 200
+        assert server.hits['/flaky'] == 3
+    finally:
+        client.close()
+
+def test_client_errors_are_not_retried(server):
+    client = HttpClient(backoff=0)
+    try:
+        assert client.get(server.url + '/missing').status_code == 404
+        assert server.hits['/missing'] == 1
+    finally:
+        client.close()
+
+def test_caps_concurrent_requests_per_limited_host(server):
+    client = HttpClient(backoff=0, max_concurrent=2, limited_hosts=('127.0.0.1',))
+    try:
+        threads = [threading.Thread(target=client.get, args=(server.url + '/slow',)) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert server.hits['/slow'] == 6
+        assert server.max_active == 2
+    finally:
+        client.close()
+
+def test_timeouts_count_as_errors(server):
+    client = HttpClient(timeout=(1, 0.05), retries=0)
+    try:
+        with pytest.raises(requests.exceptions.RequestException):
+            client.get(server.url + '/slow')
+        assert client.stats()['errors'] == 1
+        assert client.timings[-1][2] is None
+    finally:
+        client.close()
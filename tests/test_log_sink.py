@@ -0,0 +1,35 @@
+import logging
+import threading
+
+from log_sink import QueueLogHandler
+
+def make_logger(name, capacity):
+    handler = QueueLogHandler(capacity=capacity)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger = logging.getLogger(name)
+    logger.addHandler(handler)
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return logger, handler
+
+def test_drains_in_order_and_in_batches():
+    logger, handler = make_logger('test_log_sink.order', capacity=100)
+    for n in range(5):
+        logger.info(f"line {n}")
+    assert handler.drain(3) == [(logging.INFO, f"line {n}") for n in range(3)]
+    assert [line for _, line in handler.drain(10)] == ["line 3", "line 4"]
+    assert handler.drain(10) == []
+    assert handler.dropped == 0
+
+def test_drops_the_oldest_records_when_full():
+    logger, handler = make_logger('test_log_sink.flood', capacity=50)
+    threads = [threading.Thread(target=lambda k=k: [logger.info(f"{k}-{n}") for n in range(200)]) for k in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    records = handler.drain(1000)
+    assert len(records) == 50
+    assert handler.dropped == 750
+    # Whatever survived is the newest line of at least one thread
+    assert any(line.endswith("-199") for _, line in records)
@@ -0,0 +1,37 @@
+import json
+
+from parse_xml import update_db
+
+XML = """<?xml version="1.0" encoding="UTF-8"?>
+<datafile>
+<game name="Metroid Dread (AXN7A)"><id>AXN7A</id><type>Switch</type><region>NTSC-U</region>
+<locale lang="EN"><title>Metroid Dread</title></locale><locale lang="JA"><title>メトロイド ドレッド</title></locale></game>
+<game name="Super Mario Odyssey (AAACA)"><id>AAACA</id><type>Switch</type><region>ALL</region>
+<locale lang="EN"><title>Super Mario Odyssey</title></locale></game>
+</datafile>
+"""
+
+def build(tmp_path):
+    return update_db(input_file=str(tmp_path / 'switchtdb.xml'), output_file=str(tmp_path / 'games.json'))
+
+def test_unchanged_dump_is_skipped(tmp_path):
+    (tmp_path / 'switchtdb.xml').write_text(XML, encoding='utf-8')
+    assert build(tmp_path)['full'] is True
+    delta = build(tmp_path)
+    assert delta['full'] is False
+    assert delta['total'] == 2
+    assert not (delta['added'] or delta['changed'] or delta['removed'])
+
+def test_build_from_an_older_format_is_redone(tmp_path):
+    (tmp_path / 'switchtdb.xml').write_text(XML, encoding='utf-8')
+    build(tmp_path)
+    # As left by a version that didn't record its format, with the XML untouched since
+    manifest_path = tmp_path / 'games.manifest.json'
+    manifest = json.loads(manifest_path.read_text(encoding='utf-8'))
+    manifest.pop('format', None)
+    manifest_path.write_text(json.dumps(manifest), encoding='utf-8')
+
+    assert build(tmp_path)['full'] is True
+    games = json.loads((tmp_path / 'games.json').read_text(encoding='utf-8'))
+    assert "メトロイド ドレッド" in next(game for game in games if game['id'] == 'AXN7A')['aliases']
+    assert 'format' in json.loads(manifest_path.read_text(encoding='utf-8'))
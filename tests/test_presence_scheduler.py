@@ -0,0 +1,34 @@
+import json
+
+from presence_scheduler import DEFAULT_DURATION, PresenceScheduler, load_profiles
+
+class FakeBackend:
+    def __init__(self):
+        self.shown = []
+
+    def update_presence(self, **kwargs):
+        self.shown.append(kwargs)
+
+def test_invalid_durations_fall_back_to_the_default(tmp_path):
+    path = tmp_path / 'profiles.json'
+    path.write_text(json.dumps([
+        {'name': "typo", 'details': "Metroid Dread", 'duration': "five minutes"},
+        {'name': "text", 'details': "Mario Kart 8 Deluxe", 'duration': "60"},
+        {'name': "unset", 'details': "Super Mario Odyssey"},
+    ]), encoding='utf-8')
+    profiles = load_profiles(str(path))
+    assert profiles["typo"]['duration'] == DEFAULT_DURATION
+    assert profiles["text"]['duration'] == 60
+    assert 'duration' not in profiles["unset"]
+
+def test_rotation_starts_despite_a_bad_duration(tmp_path):
+    backend = FakeBackend()
+    scheduler = PresenceScheduler(backend, path=str(tmp_path / 'profiles.json'))
+    try:
+        scheduler.save_profile({'name': "first", 'details': "Metroid Dread", 'duration': "abc"})
+        scheduler.save_profile({'name': "second", 'details': "Mario Kart 8 Deluxe"})
+        scheduler.play()
+        assert scheduler.rotating
+        assert [shown['details'] for shown in backend.shown] == ["Metroid Dread"]
+    finally:
+        scheduler.close()
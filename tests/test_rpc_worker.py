@@ -0,0 +1,125 @@
+import threading
+import time
+
+import pytest
+
+from rpc_worker import PresenceWorker
+
+class FakePresence:
+    """Records what the worker sends; fails connects and sends on demand."""
+    def __init__(self, connect_failures=0, send_failures=0):
+        self.connect_failures = connect_failures
+        self.send_failures = send_failures
+        self.connect_gate = threading.Event()
+        self.connect_gate.set()
+        self.connects = 0
+        self.sent = []
+        self.send_times = []
+        self.closed = 0
+
+    def __call__(self, client_id):
+        # Used as the presence_factory; every connection shares this recorder
+        return self
+
+    def connect(self):
+        self.connect_gate.wait(5)
+        self.connects += 1
+        if self.connect_failures:
+            self.connect_failures -= 1
+            raise ConnectionRefusedError("Discord is not running")
+
+    def update(self, **kwargs):
+        if self.send_failures:
+            self.send_failures -= 1
+            raise BrokenPipeError("pipe closed")
+        self.sent.append(('update', kwargs))
+        self.send_times.append(time.monotonic())
+
+    def clear(self):
+        self.sent.append(('clear', {}))
+        self.send_times.append(time.monotonic())
+
+    def close(self):
+        self.closed += 1
+
+@pytest.fixture
+def fake():
+    return FakePresence()
+
+def make_worker(fake, **kwargs):
+    kwargs.setdefault('backoff_min', 0.01)
+    kwargs.setdefault('backoff_max', 0.05)
+    return PresenceWorker('client-id', fake, **kwargs)
+
+def test_sends_updates_and_clears(fake):
+    worker = make_worker(fake)
+    try:
+        assert worker.update(details="Metroid Dread", state="Playing").result(5) is True
+        assert worker.clear().result(5) is True
+        assert fake.sent == [('update', {'details': "Metroid Dread", 'state': "Playing"}), ('clear', {})]
+        assert worker.stats()['sent'] == 2
+    finally:
+        worker.close()
+
+def test_newer_update_supersedes_unsent_one(fake):
+    fake.connect_gate.clear()
+    worker = make_worker(fake)
+    try:
+        first = worker.update(details="first")
+        second = worker.update(details="second")
+        fake.connect_gate.set()
+        assert first.result(5) is False
+        assert second.result(5) is True
+        assert fake.sent == [('update', {'details': "second"})]
+        assert worker.stats()['superseded'] == 1
+    finally:
+        worker.close()
+
+def test_spaces_sends_to_the_rate_limit(fake):
+    worker = make_worker(fake, rate_limit=2, rate_window=0.3)
+    try:
+        for n in range(3):
+            assert worker.update(details=str(n)).result(5) is True
+        assert fake.send_times[2] - fake.send_times[0] >= 0.3
+    finally:
+        worker.close()
+
+def test_reconnects_with_backoff():
+    fake = FakePresence(connect_failures=2)
+    changes = []
+    worker = make_worker(fake, on_connection_change=changes.append)
+    try:
+        assert worker.update(details="after reconnect").result(5) is True
+        assert fake.connects == 3
+        assert changes == [False, True]
+        assert worker.connected
+    finally:
+        worker.close()
+
+def test_send_error_is_reported_and_the_next_send_reconnects():
+    fake = FakePresence(send_failures=1)
+    worker = make_worker(fake)
+    try:
+        with pytest.raises(BrokenPipeError):
+            worker.update(details="lost").result(5)
+        assert worker.update(details="again").result(5) is True
+        assert fake.connects == 2
+        assert fake.sent == [('update', {'details': "again"})]
+    finally:
+        worker.close()
+
+def test_close_resolves_pending_and_rejects_new_requests(fake):
+    fake.connect_gate.clear()
+    worker = make_worker(fake)
+    pending = worker.update(details="never sent")
+    closer = threading.Thread(target=worker.close)
+    closer.start()
+    # Let the connect finish only once close() has been called
+    while not worker._closing:
+        time.sleep(0.001)
+    fake.connect_gate.set()
+    closer.join(5)
+    assert pending.result(5) is False
+    assert fake.sent == []
+    with pytest.raises(RuntimeError):
+        worker.update(details="too late").result(5)